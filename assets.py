@@ -0,0 +1,122 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+
+# Brotli es opcional: si no está instalado solo se generan variantes gzip.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Configuración del Pipeline de Assets ---
+# Carpetas bajo static/ que no son assets de la aplicación (p. ej. fotos de cédulas subidas).
+EXCLUDED_DIRS = {'uploads'}
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.svg', '.json', '.txt', '.html', '.map'}
+# Variantes precomprimidas por orden de preferencia: (Content-Encoding, sufijo del archivo).
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+FINGERPRINT_LENGTH = 12
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class AssetManifest:
+    """
+    Mapa de assets bajo static/ a nombres con huella de contenido
+    (js/form.js -> js/form.<sha256[:12]>.js) y sus variantes precomprimidas.
+
+    Se construye en el primer uso, o al crear la app si se llama a build() (servidor de
+    producción con preload). Con precompress=True las variantes .br/.gz se escriben junto al
+    archivo original si faltan o están desactualizadas; con False solo se usan las existentes.
+    """
+    def __init__(self, static_folder, precompress=True):
+        self.static_folder = static_folder
+        self.precompress = precompress
+        self.lock = threading.Lock()
+        self.fingerprinted = None   # original -> con huella
+        self.originals = None       # con huella -> original
+        self.encodings = None       # original -> [(encoding, sufijo)]
+
+    def _ensure_built(self):
+        if self.fingerprinted is None:
+            with self.lock:
+                if self.fingerprinted is None:
+                    self.build()
+
+    def build(self):
+        fingerprinted, originals, encodings = {}, {}, {}
+        for root, dirs, files in os.walk(self.static_folder):
+            if root == self.static_folder:
+                dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
+            for name in files:
+                if name.endswith(('.gz', '.br', '.tmp')):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                base, extension = os.path.splitext(filename)
+                hashed = f"{base}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}{extension}"
+                fingerprinted[filename] = hashed
+                originals[hashed] = filename
+                encodings[filename] = self._precompress(path, data) if extension in COMPRESSIBLE_EXTENSIONS else []
+        self.encodings, self.originals, self.fingerprinted = encodings, originals, fingerprinted
+        logging.info(f"Manifiesto de assets construido: {len(fingerprinted)} archivos.")
+
+    def _precompress(self, path, data):
+        available = []
+        source_mtime = os.path.getmtime(path)
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br' and brotli is None:
+                continue
+            compressed_path = path + suffix
+            if not os.path.exists(compressed_path) or os.path.getmtime(compressed_path) < source_mtime:
+                if not self.precompress:
+                    continue
+                compressed = _compress(data, encoding)
+                if len(compressed) >= len(data):
+                    continue
+                _write_atomic(compressed_path, compressed)
+            available.append((encoding, suffix))
+        return available
+
+    def url_filename(self, filename):
+        """Nombre con huella para url_for('static'); los archivos desconocidos se devuelven sin cambios."""
+        self._ensure_built()
+        return self.fingerprinted.get(filename, filename)
+
+    def resolve(self, filename):
+        """Devuelve el archivo original de un nombre con huella, o None si no tiene huella."""
+        self._ensure_built()
+        return self.originals.get(filename)
+
+    def best_variant(self, filename, accept_encodings):
+        """Elige la variante precomprimida (encoding, sufijo) que acepta el cliente, o (None, '')."""
+        self._ensure_built()
+        for encoding, suffix in self.encodings.get(filename, []):
+            if encoding in accept_encodings:
+                return encoding, suffix
+        return None, ''
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+if __name__ == '__main__':
+    # Paso de build para despliegues: genera las variantes precomprimidas por adelantado.
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    manifest = AssetManifest(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    manifest.build()
+    for original, hashed in sorted(manifest.fingerprinted.items()):
+        variants = ", ".join(encoding for encoding, _ in manifest.encodings[original]) or "sin compresión"
+        print(f"{original} -> {hashed} ({variants})")
@@ -0,0 +1,242 @@
+import os
+import csv
+import json
+import time
+import argparse
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import boto3
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError, NoCredentialsError
+
+# --- Configuraciones ---
+CHECKPOINT_FILE = ".audit_ocr.checkpoint.jsonl"
+DEFAULT_OUTPUT = "auditoria_ocr"
+CRASH_ERROR = "El proceso de OCR terminó abruptamente con esta imagen"
+REPORT_FIELDS = [
+    'cognito_sub', 'unidad', 'rut', 'rut_match_success', 'rut_detectado_imagen', 'url_img_frontal',
+    'rut_reextraido', 'coincide_reextraido', 'confianza', 'dv_valido', 'correcciones', 'rotacion', 'ancla', 'pasadas_ocr', 'tiempo_s', 'error',
+]
+
+def get_env_variable(var_name, default=None):
+    """Obtiene una variable de entorno, eliminando espacios en blanco."""
+    value = os.getenv(var_name, default)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+def iter_flagged_participations(dynamodb_client, table_name):
+    """
+    Recorre en streaming las participaciones a auditar: RUT no coincidente o no detectado.
+    Solo se proyectan los atributos que necesita el reporte.
+    """
+    paginator = dynamodb_client.get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=table_name,
+        FilterExpression='#match = :false OR #detectado = :no_detectado',
+        ProjectionExpression='cognito_sub, unidad, rut, #match, #detectado, url_img_frontal',
+        ExpressionAttributeNames={'#match': 'rut_match_success', '#detectado': 'rut_detectado_imagen'},
+        ExpressionAttributeValues={':false': {'BOOL': False}, ':no_detectado': {'S': 'No detectado'}},
+    )
+    for page in pages:
+        for item in page.get('Items', []):
+            yield {
+                'cognito_sub': item.get('cognito_sub', {}).get('S', ''),
+                'unidad': item.get('unidad', {}).get('S', ''),
+                'rut': item.get('rut', {}).get('S', ''),
+                'rut_match_success': item.get('rut_match_success', {}).get('BOOL', False),
+                'rut_detectado_imagen': item.get('rut_detectado_imagen', {}).get('S', ''),
+                'url_img_frontal': item.get('url_img_frontal', {}).get('S', 'N/A'),
+            }
+
+def _init_worker():
+    # Cada proceso usa un solo hilo de OpenCV/Tesseract: el paralelismo lo dan los procesos.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    import cv2
+    cv2.setNumThreads(1)
+
+def audit_image(image_url, image_path):
+    """Se ejecuta en un proceso del pool: vuelve a extraer el RUT de una imagen almacenada."""
+    from ocr import extract_rut_with_details
+    start_time = time.perf_counter()
+    if not os.path.exists(image_path):
+        return {'url': image_url, 'rut': None, 'error': 'Imagen no encontrada', 'elapsed': 0.0}
+    try:
+        result = extract_rut_with_details(image_path)
+    except Exception as e:
+        result = {'rut': None, 'error': str(e), 'elapsed': time.perf_counter() - start_time}
+    return {'url': image_url, **result}
+
+def isolate_crashes(image_urls, uploads_root):
+    """
+    Cuando un proceso de OCR muere (OOM, segfault de OpenCV) todas las imágenes en curso
+    fallan con BrokenProcessPool. Cada sospechosa se vuelve a procesar sola en un pool de un
+    proceso: la que vuelve a romperlo queda marcada con CRASH_ERROR.
+    """
+    results = []
+    for image_url in image_urls:
+        pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+        try:
+            result = pool.submit(audit_image, image_url, os.path.join(uploads_root, image_url.lstrip('/'))).result()
+        except BrokenProcessPool:
+            result = {'url': image_url, 'rut': None, 'error': CRASH_ERROR, 'crashed': True}
+        finally:
+            pool.shutdown(wait=True)
+        results.append(result)
+    return results
+
+def load_checkpoint(path):
+    """Carga los resultados ya calculados (un JSON por imagen) de una ejecución anterior."""
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result['url']] = result
+    return results
+
+def build_report_row(row, result):
+    from rut import normalize_rut
+    rut_reextraido = result.get('rut')
+    return {
+        **row,
+        'rut_reextraido': rut_reextraido or 'No detectado',
+        'coincide_reextraido': bool(rut_reextraido and rut_reextraido == normalize_rut(row['rut'])),
+        'confianza': round(result.get('confidence', 0.0), 3),
+        'dv_valido': result.get('verifier_valid', False),
+        'correcciones': result.get('repairs', 0),
+        'rotacion': result.get('rotation'),
+        'ancla': result.get('anchor', False),
+        'pasadas_ocr': result.get('passes', 0),
+        'tiempo_s': round(result.get('elapsed', 0.0), 3),
+        'error': result.get('error', ''),
+    }
+
+def write_report(rows, output, output_format):
+    path = f"{output}.{output_format}"
+    if output_format == 'json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    return path
+
+def run_audit(workers=None, output=DEFAULT_OUTPUT, output_format='csv', uploads_root='.', checkpoint_path=CHECKPOINT_FILE):
+    """
+    Vuelve a ejecutar el OCR sobre las imágenes de las participaciones marcadas usando un pool
+    de procesos (por defecto uno por núcleo). Cada imagen se procesa una sola vez aunque varias
+    unidades la compartan, y cada resultado se agrega al checkpoint apenas termina, de modo que
+    una ejecución interrumpida retoma solo las imágenes pendientes.
+    """
+    print("--- Iniciando la auditoría de OCR ---")
+    load_dotenv()
+    table_name = get_env_variable('DYNAMODB_TABLE_NAME', 'user_participations')
+    workers = workers or os.cpu_count() or 1
+
+    try:
+        dynamodb_client = boto3.client('dynamodb', region_name=get_env_variable('AWS_DEFAULT_REGION'))
+    except NoCredentialsError:
+        print("\033[91mError: No se encontraron las credenciales de AWS.\033[0m")
+        return
+
+    results = load_checkpoint(checkpoint_path)
+    if results:
+        print(f"Reanudando: {len(results)} imágenes ya procesadas en '{checkpoint_path}'.")
+
+    rows = []
+    submitted = set(results)
+    suspects = []
+    pending_count = 0
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(workers * 4)
+    started_at = time.perf_counter()
+
+    with open(checkpoint_path, 'a') as checkpoint:
+        def record(result):
+            nonlocal pending_count
+            with lock:
+                results[result['url']] = result
+                # Los errores (p. ej. imagen faltante) no se guardan para reintentarlos al reanudar;
+                # las imágenes que matan al proceso de OCR sí, para no repetir la caída.
+                if not result.get('error') or result.get('crashed'):
+                    checkpoint.write(json.dumps(result) + "\n")
+                    checkpoint.flush()
+                pending_count += 1
+                if pending_count % 50 == 0:
+                    elapsed = time.perf_counter() - started_at
+                    print(f"  {pending_count} imágenes procesadas ({pending_count / elapsed:.1f} imágenes/s)")
+
+        def on_done(image_url, future):
+            in_flight.release()
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                with lock:
+                    suspects.append(image_url)
+            elif error is not None:
+                record({'url': image_url, 'rut': None, 'error': str(error)})
+            else:
+                record(future.result())
+
+        print(f"Procesando imágenes con {workers} procesos...")
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        try:
+            for row in iter_flagged_participations(dynamodb_client, table_name):
+                rows.append(row)
+                image_url = row['url_img_frontal']
+                if not image_url or image_url == 'N/A' or image_url in submitted:
+                    continue
+                submitted.add(image_url)
+                in_flight.acquire()
+                try:
+                    future = pool.submit(audit_image, image_url, os.path.join(uploads_root, image_url.lstrip('/')))
+                except BrokenProcessPool:
+                    # Un proceso de OCR murió: se recrea el pool y la imagen se envía al nuevo.
+                    print("\033[93mAviso: un proceso de OCR terminó abruptamente. Se recrea el pool.\033[0m")
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+                    future = pool.submit(audit_image, image_url, os.path.join(uploads_root, image_url.lstrip('/')))
+                future.add_done_callback(partial(on_done, image_url))
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceNotFoundException':
+                print(f"\033[91mError: La tabla '{table_name}' no fue encontrada.\033[0m")
+            else:
+                print(f"\033[91mError de AWS al escanear la tabla: {e.response['Error']['Message']}\033[0m")
+            print(f"El progreso quedó guardado en '{checkpoint_path}'.")
+            return
+        finally:
+            pool.shutdown(wait=True)
+
+        if suspects:
+            print(f"Reprocesando de a una las {len(suspects)} imágenes en curso cuando murió un proceso de OCR...")
+            for result in isolate_crashes(suspects, uploads_root):
+                record(result)
+
+    if not rows:
+        print("No hay participaciones marcadas para auditar.")
+        return
+
+    no_image = {'rut': None, 'error': 'Sin imagen frontal'}
+    report_rows = [build_report_row(row, results.get(row['url_img_frontal'], no_image)) for row in rows]
+    report_path = write_report(report_rows, output, output_format)
+    recovered = sum(1 for row in report_rows if row['coincide_reextraido'])
+    elapsed = time.perf_counter() - started_at
+    print(f"\n\033[92mAuditoría completada en {elapsed:.1f} s.\033[0m")
+    print(f"Participaciones auditadas: {len(report_rows)} | Imágenes procesadas en esta ejecución: {pending_count}")
+    print(f"RUT coincidente tras la nueva extracción: {recovered}")
+    print(f"Reporte: '{report_path}'")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vuelve a ejecutar el OCR sobre las participaciones con RUT no coincidente o no detectado.")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos de OCR (por defecto, uno por núcleo).")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Ruta del reporte, sin extensión.")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', help="Formato del reporte.")
+    parser.add_argument('--uploads-root', default='.', help="Directorio desde el que se resuelven las URLs /static/uploads/...")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help="Archivo de checkpoint para reanudar.")
+    args = parser.parse_args()
+    run_audit(args.workers, args.output, args.format, args.uploads_root, args.checkpoint)
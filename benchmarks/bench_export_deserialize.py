@@ -0,0 +1,108 @@
+"""
+Benchmark de deserialización para export_to_excel.py.
+
+Compara el camino por filas original (acumular los ítems de todas las páginas,
+deserializarlos uno a uno y recorrer sus claves para los encabezados) contra
+deserialize_pages_columnar sobre páginas sintéticas con la forma de una participación.
+También se mide deserialize_dynamodb_item actual como referencia.
+
+Uso: python benchmarks/bench_export_deserialize.py [filas]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from export_to_excel import deserialize_dynamodb_item, deserialize_pages_columnar
+
+PAGE_SIZE = 100
+
+def build_item(i):
+    return {
+        'cognito_sub': {'S': f'sub-{i // 3}'},
+        'unidad': {'S': str(100 + i % 3)},
+        'tipo_unidad': {'S': 'Departamento'},
+        'nombre': {'S': f'Usuario {i}'},
+        'rut': {'S': '12.345.678-5'},
+        'email': {'S': f'user{i}@example.com'},
+        'comunidad': {'S': 'Comunidad Demo'},
+        'decision_reglamento': {'S': 'Si'},
+        'timestamp_votacion': {'S': '2026-01-01T12:00:00'},
+        'rut_match_success': {'BOOL': i % 5 != 0},
+        'rut_detectado_imagen': {'S': '123456785'},
+        'url_img_frontal': {'S': f'/static/uploads/{i}_frontal.jpg'},
+        'url_img_trasera': {'S': 'N/A'},
+        'user_agent': {'S': 'Mozilla/5.0'},
+        'ip_address': {'S': '10.0.0.1'},
+        'device_type': {'S': 'Mobile'},
+        'cantidad_intentos_rut': {'N': str(1 + i % 4)},
+        'tiempo_deteccion_rut': {'N': '3.14159'},
+    }
+
+def build_pages(rows):
+    items = [build_item(i) for i in range(rows)]
+    return [{'Items': items[i:i + PAGE_SIZE]} for i in range(0, rows, PAGE_SIZE)]
+
+def original_deserialize_dynamodb_item(item):
+    """Copia de deserialize_dynamodb_item antes del cambio a columnar, para comparar contra ella."""
+    deserialized = {}
+    for key, value in item.items():
+        data_type = list(value.keys())[0]
+        val = value[data_type]
+
+        if data_type == 'S':
+            deserialized[key] = val
+        elif data_type == 'N':
+            try:
+                deserialized[key] = int(val)
+            except (ValueError, TypeError):
+                try:
+                    deserialized[key] = float(val)
+                except (ValueError, TypeError):
+                    deserialized[key] = val
+        elif data_type == 'BOOL':
+            deserialized[key] = val
+        elif data_type == 'NULL':
+            deserialized[key] = None
+        else:
+            deserialized[key] = str(val)
+    return deserialized
+
+def bench_original(pages):
+    items_raw = []
+    for page in pages:
+        items_raw.extend(page['Items'])
+    processed = [original_deserialize_dynamodb_item(item) for item in items_raw]
+    all_keys = set()
+    for item in processed:
+        all_keys.update(item.keys())
+    return len(processed)
+
+def bench_row_oriented(pages):
+    processed = [deserialize_dynamodb_item(item) for page in pages for item in page['Items']]
+    all_keys = set()
+    for item in processed:
+        all_keys.update(item.keys())
+    return len(processed)
+
+def bench_columnar(pages):
+    row_count, _ = deserialize_pages_columnar(pages)
+    return row_count
+
+def run(label, func, pages, rows, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<10} {best * 1000:9.2f} ms  {best / rows * 1e6:7.2f} µs/fila")
+    return best
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    pages = build_pages(rows)
+    print(f"Deserializando {rows} filas en páginas de {PAGE_SIZE}:")
+    original_time = run("original", bench_original, pages, rows)
+    run("por filas", bench_row_oriented, pages, rows)
+    col_time = run("columnar", bench_columnar, pages, rows)
+    print(f"Aceleración frente al camino original: {original_time / col_time:.2f}x")
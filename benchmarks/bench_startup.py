@@ -0,0 +1,55 @@
+"""
+Benchmark de arranque de la aplicación web.
+
+Mide, en procesos nuevos, el tiempo de `import main` (que incluye create_app) y el
+de la primera respuesta a '/', y verifica que el stack de OCR no se haya importado.
+Con --max-ms el script termina con error si la mediana supera ese presupuesto.
+
+Uso: python benchmarks/bench_startup.py [--runs N] [--max-ms MS]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'ocr_loaded': 'cv2' in sys.modules,
+}))
+"""
+
+def run_probe():
+    env = {'SECRET_KEY': 'benchmark', 'AWS_DEFAULT_REGION': 'us-east-1', **os.environ}
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+    import_ms = statistics.median(s['import_ms'] for s in samples)
+    first_request_ms = statistics.median(s['first_request_ms'] for s in samples)
+    ocr_loaded = any(s['ocr_loaded'] for s in samples)
+    print(f"import main (mediana de {args.runs}): {import_ms:8.1f} ms")
+    print(f"primera respuesta a '/':{first_request_ms:8.1f} ms")
+    print(f"stack de OCR cargado:   {'sí' if ocr_loaded else 'no'}")
+
+    if ocr_loaded:
+        sys.exit("Regresión: importar main carga OpenCV/Tesseract.")
+    if args.max_ms is not None and import_ms > args.max_ms:
+        sys.exit(f"Regresión: el arranque tarda {import_ms:.1f} ms (presupuesto: {args.max_ms:.1f} ms).")
@@ -0,0 +1,62 @@
+import os
+import time
+import random
+import threading
+
+# Utilidades compartidas por los scripts de operaciones masivas sobre AWS
+# (clear_dynamo.py, cognito_user_cleaner.py, cognito_invitation_sender.py).
+
+class TokenBucket:
+    """Limitador de tasa: entrega como máximo `rate` permisos por segundo, con ráfagas de hasta `capacity`."""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = max(capacity or rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+def backoff_delay(attempt, base_seconds, max_seconds):
+    """Backoff exponencial con jitter para no sincronizar los reintentos de todos los hilos."""
+    return min(max_seconds, base_seconds * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+class Journal:
+    """
+    Registro local de solo agregado (un valor por línea) de los elementos ya procesados.
+    Permite que una ejecución interrumpida se reanude omitiendo lo que ya se hizo.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = {line.rstrip('\n') for line in f if line.strip()}
+        self.file = open(self.path, 'a')
+
+    def __contains__(self, value):
+        return value in self.entries
+
+    def record(self, *values):
+        with self.lock:
+            for value in values:
+                self.entries.add(value)
+                self.file.write(f"{value}\n")
+            self.file.flush()
+
+    def close(self, remove=False):
+        self.file.close()
+        if remove:
+            os.remove(self.path)
@@ -1,8 +1,15 @@
 
 import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError
+from bulk_ops import backoff_delay
 
 # Carga la configuración de AWS desde el archivo .env
 load_dotenv()
@@ -11,13 +18,240 @@ load_dotenv()
 table_name = os.getenv('DYNAMODB_TABLE_NAME', 'user_participations')
 region_name = os.getenv('AWS_DEFAULT_REGION')
 
-# Inicializa los clientes de AWS
-dynamodb_client = boto3.client('dynamodb', region_name=region_name)
-dynamodb_resource = boto3.resource('dynamodb', region_name=region_name)
+# --- Parámetros de la purga ---
+TOTAL_SEGMENTS = 8          # Segmentos del scan paralelo
+DELETE_WORKERS = 16         # Hilos que ejecutan batch_write_item en paralelo
+BATCH_SIZE = 25             # Máximo de DeleteRequest por batch_write_item
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.1
+MAX_BACKOFF_SECONDS = 10
+RECREATE_THRESHOLD = 10000  # Ítems a partir de los cuales conviene recrear la tabla
+CHECKPOINT_FILE = f".clear_dynamo_{table_name}.checkpoint.json"
+THROTTLING_ERRORS = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+}
 
-def clean_dynamo_table():
+# Inicializa el cliente de AWS con suficientes conexiones para todos los hilos
+dynamodb_client = boto3.client(
+    'dynamodb',
+    region_name=region_name,
+    config=Config(
+        max_pool_connections=TOTAL_SEGMENTS + DELETE_WORKERS,
+        retries={'max_attempts': 10, 'mode': 'adaptive'},
+    )
+)
+
+def _call_with_backoff(operation, **kwargs):
+    """Ejecuta una llamada a DynamoDB reintentando solo ante errores de throttling."""
+    for attempt in range(MAX_RETRIES):
+        try:
+            return operation(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERRORS or attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(backoff_delay(attempt, BASE_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS))
+
+def _delete_batch(keys):
+    """
+    Elimina un lote de hasta 25 claves, reintentando los UnprocessedItems con backoff.
+    Devuelve la cantidad de ítems eliminados.
+    """
+    pending = [{'DeleteRequest': {'Key': key}} for key in keys]
+    for attempt in range(MAX_RETRIES):
+        response = _call_with_backoff(dynamodb_client.batch_write_item, RequestItems={table_name: pending})
+        pending = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not pending:
+            return len(keys)
+        time.sleep(backoff_delay(attempt, BASE_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS))
+    raise RuntimeError(f"No se pudieron eliminar {len(pending)} ítems tras {MAX_RETRIES} reintentos.")
+
+class PurgeProgress:
+    """
+    Progreso por segmento de la purga, persistido en un archivo local para poder reanudar.
+    Cada segmento guarda su último LastEvaluatedKey ya eliminado y su contador.
+    """
+    def __init__(self, total_segments, path=CHECKPOINT_FILE):
+        self.path = path
+        self.total_segments = total_segments
+        self.lock = threading.Lock()
+        self.segments = {str(s): {'last_key': None, 'deleted': 0, 'done': False} for s in range(total_segments)}
+        self.resumed = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"Aviso: no se pudo leer el checkpoint '{self.path}'. Se comenzará desde cero.")
+            return
+        if data.get('table_name') != table_name or data.get('total_segments') != self.total_segments:
+            print("Aviso: el checkpoint existente corresponde a otra tabla o cantidad de segmentos. Se ignora.")
+            return
+        self.segments = data['segments']
+        self.resumed = True
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'table_name': table_name, 'total_segments': self.total_segments, 'segments': self.segments}, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def total_deleted(self):
+        return sum(state['deleted'] for state in self.segments.values())
+
+    def segment(self, segment):
+        with self.lock:
+            return dict(self.segments[str(segment)])
+
+    def advance(self, segment, deleted, last_key):
+        with self.lock:
+            state = self.segments[str(segment)]
+            state['deleted'] += deleted
+            state['last_key'] = last_key
+            state['done'] = last_key is None
+            self._save()
+            status = "completado" if state['done'] else "en curso"
+            print(f"  Segmento {segment + 1}/{self.total_segments}: {state['deleted']} eliminados ({status}). Total: {self.total_deleted}")
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def _purge_segment(segment, key_names, progress, delete_pool):
+    """
+    Escanea un segmento de la tabla página a página y envía cada página a los hilos de borrado.
+    El checkpoint solo avanza cuando todos los lotes de la página fueron eliminados.
+    """
+    state = progress.segment(segment)
+    if state['done']:
+        return
+    scan_kwargs = {
+        'TableName': table_name,
+        'ProjectionExpression': ", ".join(f"#k{i}" for i in range(len(key_names))),
+        'ExpressionAttributeNames': {f"#k{i}": name for i, name in enumerate(key_names)},
+        'Segment': segment,
+        'TotalSegments': progress.total_segments,
+    }
+    if state['last_key']:
+        scan_kwargs['ExclusiveStartKey'] = state['last_key']
+
+    while True:
+        response = _call_with_backoff(dynamodb_client.scan, **scan_kwargs)
+        keys = response.get('Items', [])
+        futures = [delete_pool.submit(_delete_batch, keys[i:i + BATCH_SIZE]) for i in range(0, len(keys), BATCH_SIZE)]
+        deleted = sum(future.result() for future in futures)
+        last_key = response.get('LastEvaluatedKey')
+        progress.advance(segment, deleted, last_key)
+        if not last_key:
+            return
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+def count_items_up_to(total_segments, limit):
     """
-    Obtiene el esquema de clave de la tabla, luego escanea y elimina todos los ítems.
+    Cuenta los ítems con un scan segmentado Select='COUNT' (ItemCount de describe_table se
+    actualiza solo cada ~6 horas). Se detiene apenas el total alcanza limit.
+    """
+    lock = threading.Lock()
+    total = 0
+
+    def count_segment(segment):
+        nonlocal total
+        scan_kwargs = {'TableName': table_name, 'Select': 'COUNT', 'Segment': segment, 'TotalSegments': total_segments}
+        while True:
+            response = _call_with_backoff(dynamodb_client.scan, **scan_kwargs)
+            with lock:
+                total += response.get('Count', 0)
+                if total >= limit:
+                    return
+            if 'LastEvaluatedKey' not in response:
+                return
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=total_segments) as pool:
+        for future in [pool.submit(count_segment, segment) for segment in range(total_segments)]:
+            future.result()
+    return total
+
+def _build_create_table_args(table):
+    """Construye los argumentos de create_table a partir de la descripción de la tabla."""
+    billing_mode = table.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+    create_args = {
+        'TableName': table['TableName'],
+        'AttributeDefinitions': table['AttributeDefinitions'],
+        'KeySchema': table['KeySchema'],
+        'BillingMode': billing_mode,
+    }
+
+    def throughput(description):
+        return {
+            'ReadCapacityUnits': description['ReadCapacityUnits'],
+            'WriteCapacityUnits': description['WriteCapacityUnits'],
+        }
+
+    if billing_mode == 'PROVISIONED':
+        create_args['ProvisionedThroughput'] = throughput(table['ProvisionedThroughput'])
+    if table.get('GlobalSecondaryIndexes'):
+        create_args['GlobalSecondaryIndexes'] = []
+        for index in table['GlobalSecondaryIndexes']:
+            index_args = {'IndexName': index['IndexName'], 'KeySchema': index['KeySchema'], 'Projection': index['Projection']}
+            if billing_mode == 'PROVISIONED':
+                index_args['ProvisionedThroughput'] = throughput(index['ProvisionedThroughput'])
+            create_args['GlobalSecondaryIndexes'].append(index_args)
+    if table.get('LocalSecondaryIndexes'):
+        create_args['LocalSecondaryIndexes'] = [
+            {'IndexName': index['IndexName'], 'KeySchema': index['KeySchema'], 'Projection': index['Projection']}
+            for index in table['LocalSecondaryIndexes']
+        ]
+    if table.get('StreamSpecification', {}).get('StreamEnabled'):
+        create_args['StreamSpecification'] = table['StreamSpecification']
+    sse = table.get('SSEDescription', {})
+    if sse.get('SSEType') == 'KMS':
+        create_args['SSESpecification'] = {'Enabled': True, 'SSEType': 'KMS', 'KMSMasterKeyId': sse['KMSMasterKeyArn']}
+    if table.get('TableClassSummary', {}).get('TableClass'):
+        create_args['TableClass'] = table['TableClassSummary']['TableClass']
+    return create_args
+
+def recreate_table(table_description):
+    """
+    Camino rápido: elimina la tabla y la vuelve a crear con el mismo esquema, índices,
+    TTL y etiquetas. Backups, PITR y autoescalado no se restauran.
+    """
+    table = table_description['Table']
+    create_args = _build_create_table_args(table)
+    ttl = dynamodb_client.describe_time_to_live(TableName=table_name).get('TimeToLiveDescription', {})
+    tags = dynamodb_client.list_tags_of_resource(ResourceArn=table['TableArn']).get('Tags', [])
+    if tags:
+        create_args['Tags'] = tags
+
+    print(f"Eliminando la tabla '{table_name}' para recrearla...")
+    dynamodb_client.delete_table(TableName=table_name)
+    dynamodb_client.get_waiter('table_not_exists').wait(TableName=table_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 150})
+
+    print("Creando la tabla con el esquema original...")
+    dynamodb_client.create_table(**create_args)
+    dynamodb_client.get_waiter('table_exists').wait(TableName=table_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 150})
+
+    if ttl.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        dynamodb_client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': ttl['AttributeName']}
+        )
+    print("Aviso: backups, PITR y autoescalado de la tabla original no se restauran automáticamente.")
+
+def clean_dynamo_table(total_segments=TOTAL_SEGMENTS, delete_workers=DELETE_WORKERS, recreate=False, recreate_threshold=RECREATE_THRESHOLD):
+    """
+    Obtiene el esquema de clave de la tabla y elimina todos los ítems con un scan segmentado
+    en paralelo que alimenta a hilos de borrado por lotes. El progreso de cada segmento se
+    guarda en un checkpoint local, por lo que una ejecución interrumpida se reanuda.
+
+    Con recreate=True, si un scan de conteo encuentra al menos recreate_threshold ítems se
+    elimina y se vuelve a crear a partir de su descripción, lo que tarda segundos en lugar de minutos.
     """
     try:
         print(f"Iniciando la limpieza de la tabla '{table_name}'...")
@@ -29,43 +263,56 @@ def clean_dynamo_table():
         key_names = [key['AttributeName'] for key in key_schema]
         print(f"Esquema de clave detectado: {key_names}")
 
-        # 2. Escanear la tabla para obtener las claves de todos los ítems
-        table = dynamodb_resource.Table(table_name)
-        scan_kwargs = {
-            'ProjectionExpression': ", ".join(key_names)
-        }
-        items_to_delete = []
-        
-        done = False
-        start_key = None
-        while not done:
-            if start_key:
-                scan_kwargs['ExclusiveStartKey'] = start_key
-            response = table.scan(**scan_kwargs)
-            items_to_delete.extend(response.get('Items', []))
-            start_key = response.get('LastEvaluatedKey', None)
-            done = start_key is None
-
-        if not items_to_delete:
+        # 2. Camino rápido: recrear la tabla si es grande. No se usa ItemCount de describe_table:
+        #    se actualiza cada ~6 horas y reporta ~0 en una tabla recién llenada.
+        deletion_protected = table_description['Table'].get('DeletionProtectionEnabled', False)
+        if recreate and deletion_protected:
+            print("La tabla tiene protección contra eliminación. Se usará el borrado por lotes.")
+        elif recreate:
+            print(f"Contando ítems con un scan segmentado (umbral: {recreate_threshold})...")
+            item_count = count_items_up_to(total_segments, recreate_threshold)
+            if item_count >= recreate_threshold:
+                print(f"La tabla tiene al menos {item_count} ítems.")
+                recreate_table(table_description)
+                PurgeProgress(total_segments).clear()
+                print(f"¡Limpieza completada! La tabla '{table_name}' fue recreada vacía.")
+                return
+            print(f"La tabla tiene {item_count} ítems, por debajo del umbral. Se usará el borrado por lotes.")
+
+        # 3. Scan segmentado en paralelo alimentando a los hilos de borrado
+        progress = PurgeProgress(total_segments)
+        if progress.resumed:
+            print(f"Reanudando desde el checkpoint '{progress.path}' ({progress.total_deleted} ítems ya eliminados).")
+        print(f"Eliminando con {total_segments} segmentos de scan y {delete_workers} hilos de borrado...")
+
+        with ThreadPoolExecutor(max_workers=delete_workers) as delete_pool, \
+             ThreadPoolExecutor(max_workers=total_segments) as scan_pool:
+            futures = [scan_pool.submit(_purge_segment, segment, key_names, progress, delete_pool) for segment in range(total_segments)]
+            for future in futures:
+                future.result()
+
+        progress.clear()
+        if not progress.total_deleted:
             print("La tabla ya está vacía. No se requiere ninguna acción.")
             return
 
-        print(f"Se encontraron {len(items_to_delete)} ítems. Procediendo a la eliminación en lotes...")
-
-        # 3. Eliminar los ítems en lotes de 25
-        with table.batch_writer() as batch:
-            for item in items_to_delete:
-                batch.delete_item(Key=item)
-        
-        print(f"¡Limpieza completada! Se han eliminado {len(items_to_delete)} ítems de la tabla '{table_name}'.")
+        print(f"¡Limpieza completada! Se han eliminado {progress.total_deleted} ítems de la tabla '{table_name}'.")
 
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceNotFoundException':
             print(f"Error: La tabla '{table_name}' no fue encontrada en la región '{region_name}'. Verifica la configuración.")
         else:
             print(f"Error de AWS al acceder a DynamoDB: {e.response['Error']['Message']}")
+            print(f"El progreso quedó guardado en '{CHECKPOINT_FILE}'. Vuelve a ejecutar el script para reanudar.")
     except Exception as e:
         print(f"Ha ocurrido un error inesperado durante la limpieza: {e}")
+        print(f"El progreso quedó guardado en '{CHECKPOINT_FILE}'. Vuelve a ejecutar el script para reanudar.")
 
 if __name__ == '__main__':
-    clean_dynamo_table()
+    parser = argparse.ArgumentParser(description="Elimina todos los ítems de la tabla de participaciones.")
+    parser.add_argument('--segments', type=int, default=TOTAL_SEGMENTS, help="Segmentos del scan paralelo.")
+    parser.add_argument('--workers', type=int, default=DELETE_WORKERS, help="Hilos de borrado por lotes.")
+    parser.add_argument('--recreate', action='store_true', help="Recrear la tabla en lugar de borrar ítem a ítem si es grande.")
+    parser.add_argument('--recreate-threshold', type=int, default=RECREATE_THRESHOLD, help="Ítems a partir de los cuales se recrea la tabla.")
+    args = parser.parse_args()
+    clean_dynamo_table(args.segments, args.workers, args.recreate, args.recreate_threshold)
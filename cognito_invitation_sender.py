@@ -1,17 +1,25 @@
 import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError, NoCredentialsError
+from user_units import parse_user_units
+from bulk_ops import TokenBucket, Journal, backoff_delay
 
 # --- Email Content ---
 # Personaliza el asunto y el cuerpo de tu correo de invitación aquí.
-# Puedes usar {name} como marcador de posición para el nombre del usuario.
+# Puedes usar {{name}} como marcador de posición para el nombre del usuario (sintaxis de plantillas de SES).
 EMAIL_SUBJECT = "¡Es hora de votar! Tu participación es importante."
 EMAIL_HTML_BODY = """
 <html>
 <head></head>
 <body>
-  <h1>Hola {name},</h1>
+  <h1>Hola {{name}},</h1>
   <p>Te invitamos a participar en el proceso de votación de nuestra comunidad.</p>
   <p>La votación estará abierta durante 7 días. Para emitir tu voto, por favor sigue el enlace a continuación:</p>
   <p><a href="https://app.mi-comunidad-genial.cl">Ir a la Aplicación de Votación</a></p>
@@ -24,7 +32,7 @@ EMAIL_HTML_BODY = """
 </html>
 """
 EMAIL_TEXT_BODY = """
-Hola {name},
+Hola {{name}},
 
 Te invitamos a participar en el proceso de votación de nuestra comunidad.
 
@@ -35,11 +43,55 @@ Tu voz es fundamental para tomar las mejores decisiones para todos.
 
 ¡Gracias por tu participación!
 
+Saludos,
+El Equipo de la Comunidad
+"""
+
+# Recordatorio para quienes aún tienen unidades pendientes. {{unidades}} se reemplaza por la lista de unidades.
+REMINDER_SUBJECT = "Recordatorio: aún no has votado"
+REMINDER_HTML_BODY = """
+<html>
+<head></head>
+<body>
+  <h1>Hola {{name}},</h1>
+  <p>Todavía no registramos tu voto para las siguientes unidades: <strong>{{unidades}}</strong>.</p>
+  <p>Para emitir tu voto, por favor sigue el enlace a continuación:</p>
+  <p><a href="https://app.mi-comunidad-genial.cl">Ir a la Aplicación de Votación</a></p>
+  <p>¡Gracias por tu participación!</p>
+  <br>
+  <p>Saludos,</p>
+  <p>El Equipo de la Comunidad</p>
+</body>
+</html>
+"""
+REMINDER_TEXT_BODY = """
+Hola {{name}},
+
+Todavía no registramos tu voto para las siguientes unidades: {{unidades}}.
+
+Para emitir tu voto, por favor copia y pega el siguiente enlace en tu navegador:
+https://app.mi-comunidad-genial.cl
+
+¡Gracias por tu participación!
+
 Saludos,
 El Equipo de la Comunidad
 """
 # --- End of Email Content ---
 
+# --- Parámetros de envío ---
+TEMPLATE_NAME = "invitacion-votacion"
+REMINDER_TEMPLATE_NAME = "recordatorio-votacion"
+DEFAULT_NAME = "miembro de la comunidad"
+BULK_BATCH_SIZE = 50          # Máximo de destinos por send_bulk_templated_email
+MAX_SEND_WORKERS = 8
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 20
+DRY_RUN_OUTBOX = "invitaciones_dry_run.jsonl"
+# SES responde Throttling tanto por tasa como por cuota diaria agotada; esta última no se reintenta.
+DAILY_QUOTA_MESSAGE = "daily message quota exceeded"
+
 
 def get_env_variable(var_name):
     """Obtiene una variable de entorno, eliminando espacios en blanco."""
@@ -48,9 +100,256 @@ def get_env_variable(var_name):
         return value.strip()
     return value
 
-def send_invitation_emails():
+class LocalSESStub:
+    """
+    Sustituto local de SES para --dry-run: renderiza las plantillas y escribe cada
+    email en un archivo JSONL en lugar de enviarlo.
+    """
+    def __init__(self, outbox_path=DRY_RUN_OUTBOX, max_send_rate=14.0):
+        self.outbox_path = outbox_path
+        self.max_send_rate = max_send_rate
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def get_send_quota(self):
+        return {'Max24HourSend': float('inf'), 'MaxSendRate': self.max_send_rate, 'SentLast24Hours': 0.0}
+
+    def get_template(self, TemplateName):
+        if TemplateName not in self.templates:
+            raise ClientError({'Error': {'Code': 'TemplateDoesNotExist', 'Message': TemplateName}}, 'GetTemplate')
+        return {'Template': self.templates[TemplateName]}
+
+    def create_template(self, Template):
+        self.templates[Template['TemplateName']] = Template
+
+    def update_template(self, Template):
+        self.templates[Template['TemplateName']] = Template
+
+    def send_bulk_templated_email(self, Source, Template, Destinations, DefaultTemplateData='{}'):
+        template = self.templates[Template]
+        defaults = json.loads(DefaultTemplateData)
+        statuses = []
+        with self.lock, open(self.outbox_path, 'a') as outbox:
+            for destination in Destinations:
+                data = {**defaults, **json.loads(destination.get('ReplacementTemplateData', '{}'))}
+                outbox.write(json.dumps({
+                    'source': Source,
+                    'to': destination['Destination']['ToAddresses'],
+                    'subject': _render_template(template['SubjectPart'], data),
+                    'text': _render_template(template['TextPart'], data),
+                    'html': _render_template(template['HtmlPart'], data),
+                }, ensure_ascii=False) + "\n")
+                statuses.append({'Status': 'Success', 'MessageId': f"dry-run-{time.time_ns()}"})
+        return {'Status': statuses}
+
+def _render_template(text, data):
+    for key, value in data.items():
+        text = text.replace("{{" + key + "}}", str(value))
+    return text
+
+def ensure_email_template(ses_client, template_name=TEMPLATE_NAME, subject=EMAIL_SUBJECT, html_body=EMAIL_HTML_BODY, text_body=EMAIL_TEXT_BODY):
+    """Crea o actualiza en SES la plantilla con el contenido configurado en este archivo."""
+    template = {'TemplateName': template_name, 'SubjectPart': subject, 'HtmlPart': html_body, 'TextPart': text_body}
+    try:
+        ses_client.get_template(TemplateName=template_name)
+        ses_client.update_template(Template=template)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TemplateDoesNotExist':
+            raise
+        ses_client.create_template(Template=template)
+
+def _get_user_attributes(user):
+    return {attr['Name']: attr['Value'] for attr in user.get('Attributes', [])}
+
+def iter_recipients(cognito_client, user_pool_id, skipped):
+    """
+    Recorre los usuarios de Cognito página a página y genera (email, datos_de_plantilla, atributos)
+    por usuario. Los usuarios sin email se cuentan en skipped['count'].
+    """
+    paginator = cognito_client.get_paginator('list_users')
+    for page in paginator.paginate(UserPoolId=user_pool_id):
+        for user in page['Users']:
+            attributes = _get_user_attributes(user)
+            user_name = attributes.get('name', user.get('Username', DEFAULT_NAME))
+            user_email = attributes.get('email')
+            if not user_email:
+                print(f"  \033[93m- Usuario {user_name} no tiene un email registrado. Omitiendo.\033[0m")
+                skipped['count'] += 1
+                continue
+            yield user_email, {'name': user_name}, attributes
+
+def load_voted_units_index(dynamodb_client, table_name):
+    """
+    Construye el conjunto de pares (cognito_sub, unidad) ya votados con un único scan
+    que solo proyecta las claves, de modo que la memoria crece con los votos y no con los ítems.
+    """
+    voted = set()
+    paginator = dynamodb_client.get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=table_name,
+        ProjectionExpression='#sub, #unidad',
+        ExpressionAttributeNames={'#sub': 'cognito_sub', '#unidad': 'unidad'},
+    )
+    for page in pages:
+        for item in page.get('Items', []):
+            if 'S' in item.get('cognito_sub', {}) and 'S' in item.get('unidad', {}):
+                voted.add((item['cognito_sub']['S'], item['unidad']['S']))
+    return voted
+
+def iter_pending_recipients(recipients, voted, stats):
+    """
+    Filtra a los usuarios que aún tienen unidades pendientes, usando el mismo parseo de
+    custom:Unidad que get_pending_units. Cada usuario se resuelve con búsquedas O(1) en el
+    índice, por lo que el cruce es lineal en usuarios + votos.
+
+    Varios usuarios de Cognito pueden compartir un email y sus unidades pendientes se combinan
+    en un único recordatorio. Por eso los destinatarios (email, datos_de_plantilla) se generan
+    después de recorrer todos los usuarios, y la memoria crece con la cantidad de emails con
+    unidades pendientes (solo se guarda el nombre y las unidades de cada uno).
+    """
+    pending_by_email = {}
+    for user_email, template_data, attributes in recipients:
+        sub = attributes.get('sub')
+        units = parse_user_units(attributes) if sub else []
+        pending = [u for u in units if (sub, u['unidad']) not in voted]
+        if not pending:
+            stats['completed'] += 1
+            continue
+        stats['pending'] += 1
+        _, pending_units = pending_by_email.setdefault(user_email, (template_data['name'], set()))
+        pending_units.update((u['tipo_unidad'], u['unidad']) for u in pending)
+    for user_email, (name, pending_units) in pending_by_email.items():
+        unidades = ", ".join(f"{tipo_unidad} {unidad}" for tipo_unidad, unidad in sorted(pending_units))
+        yield user_email, {'name': name, 'unidades': unidades}
+
+def _send_batch(ses_client, from_email, template_name, batch, bucket, journal, counters):
+    """Envía un lote de hasta 50 destinos con una sola llamada, respetando MaxSendRate."""
+    destinations = [
+        {'Destination': {'ToAddresses': [email]}, 'ReplacementTemplateData': json.dumps(template_data, ensure_ascii=False)}
+        for email, template_data in batch
+    ]
+    for attempt in range(MAX_RETRIES):
+        if counters.quota_exhausted.is_set():
+            counters.add(over_quota=len(batch))
+            return
+        bucket.acquire(len(destinations))
+        try:
+            response = ses_client.send_bulk_templated_email(
+                Source=from_email,
+                Template=template_name,
+                DefaultTemplateData=json.dumps({'name': DEFAULT_NAME, 'unidades': ''}, ensure_ascii=False),
+                Destinations=destinations,
+            )
+            break
+        except ClientError as e:
+            if DAILY_QUOTA_MESSAGE in e.response['Error'].get('Message', '').lower():
+                print(f"  \033[91m✗ Cuota diaria de SES agotada: el lote de {len(batch)} emails queda pendiente.\033[0m")
+                counters.quota_exhausted.set()
+                counters.add(over_quota=len(batch))
+                return
+            if e.response['Error']['Code'] != 'Throttling' or attempt == MAX_RETRIES - 1:
+                print(f"  \033[91m✗ Error al enviar un lote de {len(batch)} emails: {e.response['Error']['Message']}\033[0m")
+                counters.add(failure=len(batch))
+                return
+            time.sleep(backoff_delay(attempt, BASE_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS))
+        except Exception as e:
+            # Errores de red o de botocore (EndpointConnectionError, ReadTimeoutError...): el lote
+            # cuenta como fallido y queda fuera del journal para reintentarlo al reanudar.
+            print(f"  \033[91m✗ Error al enviar un lote de {len(batch)} emails: {e}\033[0m")
+            counters.add(failure=len(batch))
+            return
+
+    delivered = []
+    for (email, _), status in zip(batch, response.get('Status', [])):
+        if status.get('Status') == 'Success':
+            delivered.append(email)
+        else:
+            print(f"  \033[91m✗ Error al enviar email a {email}: {status.get('Status')} {status.get('Error', '')}\033[0m")
+    journal.record(*delivered)
+    counters.add(success=len(delivered), failure=len(batch) - len(delivered))
+
+class SendCounters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.success = 0
+        self.failure = 0
+        self.over_quota = 0
+        self.quota_exhausted = threading.Event()
+
+    def add(self, success=0, failure=0, over_quota=0):
+        with self.lock:
+            self.success += success
+            self.failure += failure
+            self.over_quota += over_quota
+            if success:
+                print(f"  \033[92m✓ {self.success} emails enviados hasta ahora\033[0m")
+
+def send_templated_batches(ses_client, recipients, from_email, journal, template_name=TEMPLATE_NAME):
     """
-    Obtiene todos los usuarios de un User Pool de Cognito y les envía un email de invitación usando SES.
+    Agrupa los destinatarios (email, datos_de_plantilla) en lotes de hasta 50 y los envía con send_bulk_templated_email.
+    La concurrencia y la tasa se ajustan al MaxSendRate de la cuenta. Los emails que ya
+    figuran en el journal se omiten, y no se encolan más emails que los que permite la cuota
+    de 24 horas: el resto queda sin enviar y se envía al reanudar.
+
+    Devuelve un diccionario con sent, failed, journal (omitidos por envío previo),
+    duplicates (emails repetidos en esta ejecución) y over_quota (no enviados por cuota diaria).
+    """
+    quota = ses_client.get_send_quota()
+    max_send_rate = quota['MaxSendRate']
+    # Max24HourSend == -1 indica una cuota diaria ilimitada.
+    if quota['Max24HourSend'] < 0:
+        remaining_24h = float('inf')
+    else:
+        remaining_24h = max(0, quota['Max24HourSend'] - quota['SentLast24Hours'])
+    # Un lote nunca supera lo que la cuenta puede enviar en un segundo.
+    batch_size = max(1, min(BULK_BATCH_SIZE, int(max_send_rate)))
+    workers = max(1, min(MAX_SEND_WORKERS, int(max_send_rate // batch_size) + 1))
+    print(f"Cuota de SES: {max_send_rate:g} emails/s, {remaining_24h:g} disponibles en las últimas 24 h. Lotes de {batch_size}, hilos de envío: {workers}")
+
+    bucket = TokenBucket(max_send_rate)
+    counters = SendCounters()
+    already_sent = 0
+    duplicates = 0
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(batch):
+            in_flight.acquire()
+            future = pool.submit(_send_batch, ses_client, from_email, template_name, batch, bucket, journal, counters)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+
+        batch = []
+        queued = set()
+        for email, template_data in recipients:
+            if email in journal:
+                already_sent += 1
+                continue
+            if email in queued:
+                # Varios usuarios de Cognito con el mismo email reciben un solo correo.
+                duplicates += 1
+                continue
+            if len(queued) >= remaining_24h or counters.quota_exhausted.is_set():
+                counters.add(over_quota=1)
+                continue
+            queued.add(email)
+            batch.append((email, template_data))
+            if len(batch) == batch_size:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+    # Propaga cualquier excepción no prevista de un lote en lugar de perderla en el hilo.
+    for future in futures:
+        future.result()
+    if counters.over_quota:
+        print(f"\033[93mCuota diaria de SES alcanzada: {counters.over_quota} emails quedan pendientes para la próxima ejecución.\033[0m")
+    return {'sent': counters.success, 'failed': counters.failure, 'journal': already_sent, 'duplicates': duplicates, 'over_quota': counters.over_quota}
+
+def send_invitation_emails(dry_run=False, reminder=False):
+    """
+    Obtiene todos los usuarios de un User Pool de Cognito y les envía un email de invitación
+    usando una plantilla de SES y send_bulk_templated_email (hasta 50 destinos por llamada).
     
     Requiere que las siguientes variables de entorno estén configuradas:
     - AWS_ACCESS_KEY_ID
@@ -58,14 +357,22 @@ def send_invitation_emails():
     - AWS_DEFAULT_REGION
     - COGNITO_USER_POOL_ID
     - SES_FROM_EMAIL_ADDRESS: La dirección de email verificada en SES para usar como remitente.
+    - DYNAMODB_TABLE_NAME (solo con reminder=True, por defecto 'user_participations')
+
+    Con dry_run=True los correos se escriben en un archivo local en lugar de enviarse por SES.
+    Con reminder=True solo se envía un recordatorio a los usuarios que aún tienen unidades
+    pendientes según la tabla de participaciones. El journal (de invitaciones o de recordatorios)
+    se elimina al terminar sin fallos, para que una nueva ronda vuelva a incluir a todos.
     """
-    print("--- Iniciando el script de envío de invitaciones ---")
+    kind = "recordatorios" if reminder else "invitaciones"
+    print(f"--- Iniciando el script de envío de {kind} ---")
     
     load_dotenv()
     
     aws_region = get_env_variable("AWS_DEFAULT_REGION")
     user_pool_id = get_env_variable("COGNITO_USER_POOL_ID")
     from_email = get_env_variable("SES_FROM_EMAIL_ADDRESS")
+    table_name = get_env_variable("DYNAMODB_TABLE_NAME") or 'user_participations'
     
     if not all([aws_region, user_pool_id, from_email]):
         print("\033[91mError: Faltan una o más variables de entorno requeridas (AWS_DEFAULT_REGION, COGNITO_USER_POOL_ID, SES_FROM_EMAIL_ADDRESS).\033[0m")
@@ -74,82 +381,80 @@ def send_invitation_emails():
     print(f"Región de AWS: {aws_region}")
     print(f"Cognito User Pool ID: {user_pool_id}")
     print(f"Email de remitente (SES): {from_email}")
+    if reminder:
+        print(f"Tabla de participaciones: {table_name}")
+    if dry_run:
+        print(f"\033[93mModo de prueba: los correos se escribirán en '{DRY_RUN_OUTBOX}' y no se enviarán.\033[0m")
 
     try:
         cognito_client = boto3.client('cognito-idp', region_name=aws_region)
-        ses_client = boto3.client('ses', region_name=aws_region)
+        dynamodb_client = boto3.client('dynamodb', region_name=aws_region) if reminder else None
+        if dry_run:
+            ses_client = LocalSESStub()
+        else:
+            ses_client = boto3.client('ses', region_name=aws_region, config=Config(max_pool_connections=MAX_SEND_WORKERS))
     except NoCredentialsError:
         print("\033[91mError: No se encontraron las credenciales de AWS. Asegúrate de que AWS_ACCESS_KEY_ID y AWS_SECRET_ACCESS_KEY estén configuradas.\033[0m")
         return
 
-    all_users = []
+    # Journal local (un email por línea) de los destinatarios a los que SES ya aceptó el envío.
+    journal = Journal(f".{kind}_{user_pool_id}" + ("_dry_run" if dry_run else "") + ".journal")
+    if journal.entries:
+        print(f"Reanudando: {len(journal.entries)} emails ya figuran como enviados en '{journal.path}'.")
+
+    skipped = {'count': 0}
+    reminder_stats = {'pending': 0, 'completed': 0}
     try:
-        print("\nObteniendo la lista de usuarios de Cognito...")
-        paginator = cognito_client.get_paginator('list_users')
-        pages = paginator.paginate(UserPoolId=user_pool_id)
-        
-        for page in pages:
-            all_users.extend(page['Users'])
-        
-        print(f"Se encontraron {len(all_users)} usuarios en total.")
-    
+        recipients = iter_recipients(cognito_client, user_pool_id, skipped)
+        if reminder:
+            print("\nConstruyendo el índice de unidades ya votadas...")
+            voted = load_voted_units_index(dynamodb_client, table_name)
+            print(f"Se encontraron {len(voted)} unidades con voto registrado.")
+            ensure_email_template(ses_client, REMINDER_TEMPLATE_NAME, REMINDER_SUBJECT, REMINDER_HTML_BODY, REMINDER_TEXT_BODY)
+            recipients = iter_pending_recipients(recipients, voted, reminder_stats)
+            template_name = REMINDER_TEMPLATE_NAME
+        else:
+            ensure_email_template(ses_client)
+            recipients = ((email, template_data) for email, template_data, _ in recipients)
+            template_name = TEMPLATE_NAME
+        print(f"\nEnviando correos de {kind}...")
+        summary = send_templated_batches(ses_client, recipients, from_email, journal, template_name)
     except ClientError as e:
-        print(f"\033[91mError al obtener usuarios de Cognito: {e}\033[0m")
+        journal.close()
+        print(f"\033[91mError de AWS durante el envío: {e}\033[0m")
+        print(f"El progreso quedó guardado en '{journal.path}'. Vuelve a ejecutar el script para reanudar.")
         return
 
-    if not all_users:
-        print("No hay usuarios a los que enviar correos. Finalizando script.")
-        return
+    # Sin fallos ni pendientes por cuota no hay nada que reanudar: la próxima campaña al mismo pool parte de cero.
+    journal.close(remove=not summary['failed'] and not summary['over_quota'])
 
-    print("\nEnviando correos de invitación...")
-    success_count = 0
-    failure_count = 0
-
-    for user in all_users:
-        user_email = None
-        user_name = user.get('Username', 'miembro de la comunidad')
-        
-        for attr in user.get('Attributes', []):
-            if attr['Name'] == 'email':
-                user_email = attr['Value']
-            if attr['Name'] == 'name':
-                user_name = attr['Value']
-
-        if user_email:
-            try:
-                personalized_html_body = EMAIL_HTML_BODY.format(name=user_name)
-                personalized_text_body = EMAIL_TEXT_BODY.format(name=user_name)
-
-                ses_client.send_email(
-                    Destination={'ToAddresses': [user_email]},
-                    Message={
-                        'Body': {
-                            'Html': {'Charset': 'UTF-8', 'Data': personalized_html_body},
-                            'Text': {'Charset': 'UTF-8', 'Data': personalized_text_body},
-                        },
-                        'Subject': {'Charset': 'UTF-8', 'Data': EMAIL_SUBJECT},
-                    },
-                    Source=from_email,
-                )
-                print(f"  \033[92m✓ Email enviado exitosamente a {user_email}\033[0m")
-                success_count += 1
-            except ClientError as e:
-                print(f"  \033[91m✗ Error al enviar email a {user_email}: {e.response['Error']['Message']}\033[0m")
-                failure_count += 1
-        else:
-            print(f"  \033[93m- Usuario {user_name} no tiene un email registrado. Omitiendo.\033[0m")
-            failure_count += 1
-            
     print("\n--- Proceso de envío finalizado ---")
-    print(f"\033[92mEnvíos exitosos: {success_count}\033[0m")
-    print(f"\033[91mEnvíos fallidos u omitidos: {failure_count}\033[0m")
+    if reminder:
+        print(f"Usuarios con unidades pendientes: {reminder_stats['pending']}")
+        print(f"Usuarios que ya completaron su votación (sin envío): {reminder_stats['completed']}")
+    print(f"\033[92mEnvíos exitosos: {summary['sent']}\033[0m")
+    print(f"Omitidos por envío previo (journal): {summary['journal']}")
+    if summary['duplicates']:
+        print(f"Omitidos por email repetido entre usuarios: {summary['duplicates']}")
+    if summary['over_quota']:
+        print(f"\033[93mPendientes por cuota diaria de SES (se envían al reanudar): {summary['over_quota']}\033[0m")
+    print(f"\033[91mEnvíos fallidos u omitidos: {summary['failed'] + skipped['count']}\033[0m")
     print("-------------------------------------")
 
 
 if __name__ == "__main__":
-    confirm = input("\nEste script enviará un correo de invitación a TODOS los usuarios del User Pool configurado.\n¿Estás seguro de que quieres continuar? (escribe 'enviar' para confirmar): ")
+    parser = argparse.ArgumentParser(description="Envía invitaciones de votación a los usuarios del User Pool.")
+    parser.add_argument('--dry-run', action='store_true', help="Usar un sustituto local de SES en lugar de enviar correos.")
+    parser.add_argument('--reminder', action='store_true', help="Enviar un recordatorio solo a quienes aún tienen unidades sin votar.")
+    args = parser.parse_args()
+
+    if args.reminder:
+        prompt = "\nEste script enviará un recordatorio a los usuarios del User Pool que aún tienen unidades sin votar."
+    else:
+        prompt = "\nEste script enviará un correo de invitación a TODOS los usuarios del User Pool configurado."
+    confirm = input(f"{prompt}\n¿Estás seguro de que quieres continuar? (escribe 'enviar' para confirmar): ")
     if confirm.lower() == 'enviar':
-        send_invitation_emails()
+        send_invitation_emails(dry_run=args.dry_run, reminder=args.reminder)
     else:
         print("\nOperación cancelada por el usuario.")
         print("--- Script finalizado ---")
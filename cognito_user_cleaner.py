@@ -1,8 +1,23 @@
 
 import os
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
 from dotenv import load_dotenv
 from botocore.exceptions import ClientError, NoCredentialsError
+from bulk_ops import TokenBucket, Journal, backoff_delay
+
+# --- Parámetros de la eliminación ---
+# Cuota por defecto de Cognito para AdminDeleteUser (categoría UserUpdate): 25 solicitudes por segundo.
+DELETE_RATE_PER_SECOND = 25
+DELETE_WORKERS = 10
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.2
+MAX_BACKOFF_SECONDS = 10
+PROGRESS_INTERVAL_SECONDS = 5
 
 def get_env_variable(var_name):
     """Obtiene una variable de entorno, eliminando espacios en blanco."""
@@ -11,7 +26,66 @@ def get_env_variable(var_name):
         return value.strip()
     return value
 
-def delete_all_cognito_users():
+class DeletionStats:
+    """Contadores compartidos entre hilos con un resumen periódico en lugar de una línea por usuario."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.last_report = self.started_at
+        self.deleted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def add(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+            now = time.monotonic()
+            if now - self.last_report >= PROGRESS_INTERVAL_SECONDS:
+                self.last_report = now
+                self._print_summary(now)
+
+    def _print_summary(self, now):
+        elapsed = now - self.started_at
+        rate = self.deleted / elapsed if elapsed else 0
+        print(f"  Eliminados: {self.deleted} | Omitidos (ya eliminados): {self.skipped} | Fallidos: {self.failed} | {rate:.1f} usuarios/s")
+
+    def report(self):
+        with self.lock:
+            self._print_summary(time.monotonic())
+
+def _delete_user(cognito_client, user_pool_id, username, bucket, journal, stats):
+    """Elimina un usuario respetando el limitador de tasa y reintentando ante TooManyRequestsException."""
+    for attempt in range(MAX_RETRIES):
+        bucket.acquire()
+        try:
+            cognito_client.admin_delete_user(UserPoolId=user_pool_id, Username=username)
+            journal.record(username)
+            stats.add('deleted')
+            return
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'UserNotFoundException':
+                journal.record(username)
+                stats.add('skipped')
+                return
+            if code != 'TooManyRequestsException' or attempt == MAX_RETRIES - 1:
+                print(f"  \033[91mFALLÓ la eliminación de {username} ({e.response['Error']['Message']})\033[0m")
+                stats.add('failed')
+                return
+            time.sleep(backoff_delay(attempt, BASE_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS))
+        except Exception as e:
+            print(f"  \033[91mFALLÓ la eliminación de {username} ({e})\033[0m")
+            stats.add('failed')
+            return
+
+def _iter_usernames(cognito_client, user_pool_id):
+    """Recorre los usuarios página a página sin acumularlos en memoria."""
+    paginator = cognito_client.get_paginator('list_users')
+    for page in paginator.paginate(UserPoolId=user_pool_id, AttributesToGet=[]):
+        for user in page['Users']:
+            yield user['Username']
+
+def delete_all_cognito_users(rate=DELETE_RATE_PER_SECOND, workers=DELETE_WORKERS):
     """
     Elimina todos los usuarios de un User Pool de Amazon Cognito.
     
@@ -20,6 +94,10 @@ def delete_all_cognito_users():
     - AWS_SECRET_ACCESS_KEY: La clave de acceso secreta de AWS.
     - AWS_DEFAULT_REGION: La región de AWS (ej. 'us-east-1').
     - COGNITO_USER_POOL_ID: El ID del User Pool de Cognito del cual se eliminarán los usuarios.
+
+    Los usuarios se listan por páginas y se eliminan con `workers` hilos limitados a `rate`
+    solicitudes por segundo. Los eliminados se registran en un journal local para que una
+    ejecución interrumpida pueda reanudarse sin repetir trabajo.
     """
     print("--- Iniciando el script de limpieza de usuarios de Cognito ---")
     
@@ -45,7 +123,8 @@ def delete_all_cognito_users():
             'cognito-idp',
             aws_access_key_id=get_env_variable('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=get_env_variable('AWS_SECRET_ACCESS_KEY'),
-            region_name=aws_region
+            region_name=aws_region,
+            config=Config(max_pool_connections=workers + 1)
         )
         # Probar la conexión
         cognito_client.describe_user_pool(UserPoolId=user_pool_id)
@@ -68,46 +147,70 @@ def delete_all_cognito_users():
         return
 
     # --- 3. Listar y eliminar usuarios ---
+    # Journal local (un Username por línea) de los usuarios ya eliminados.
+    journal = Journal(f".cognito_user_cleaner_{user_pool_id}.journal")
+    stats = DeletionStats()
+    bucket = TokenBucket(rate)
+    if journal.entries:
+        print(f"\nReanudando: {len(journal.entries)} usuarios ya figuran como eliminados en '{journal.path}'.")
     try:
-        print("\nObteniendo la lista de usuarios. Esto puede tardar unos segundos...")
-        all_users = []
-        paginator = cognito_client.get_paginator('list_users')
-        pages = paginator.paginate(UserPoolId=user_pool_id)
-        
-        for page in pages:
-            all_users.extend(page['Users'])
-
-        if not all_users:
+        print(f"\nEliminando usuarios con {workers} hilos, limitado a {rate} solicitudes por segundo...")
+        # Las páginas de list_users pueden saltarse usuarios si se elimina mientras se pagina,
+        # por lo que se repite el recorrido hasta que una pasada no encuentre usuarios pendientes.
+        pass_number = 0
+        while True:
+            pass_number += 1
+            found = 0
+            # Limita los usuarios en cola para no volver a acumular la lista completa en memoria.
+            in_flight = threading.BoundedSemaphore(workers * 2)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for username in _iter_usernames(cognito_client, user_pool_id):
+                    if username in journal:
+                        continue
+                    found += 1
+                    in_flight.acquire()
+                    future = pool.submit(_delete_user, cognito_client, user_pool_id, username, bucket, journal, stats)
+                    future.add_done_callback(lambda _: in_flight.release())
+            if not found:
+                break
+            print(f"  Pasada {pass_number} completada ({found} usuarios procesados). Verificando usuarios restantes...")
+            if stats.failed:
+                break
+
+        stats.report()
+        if not stats.deleted and not stats.failed and not journal.entries:
             print("\n\033[92mNo se encontraron usuarios en el User Pool. ¡No hay nada que hacer!\033[0m")
+            journal.close(remove=True)
             print("--- Script finalizado con éxito ---")
             return
 
-        print(f"Se encontraron {len(all_users)} usuarios. Procediendo a la eliminación.")
-        
-        for i, user in enumerate(all_users):
-            username = user['Username']
-            print(f"  ({i+1}/{len(all_users)}) Eliminando usuario: {username}...", end='')
-            try:
-                cognito_client.admin_delete_user(
-                    UserPoolId=user_pool_id,
-                    Username=username
-                )
-                print(" \033[92mHECHO\033[0m")
-            except ClientError as e:
-                print(f" \033[91mFALLÓ ({e.response['Error']['Message']})\033[0m")
+        if stats.failed:
+            journal.close()
+            print(f"\n\033[93mProceso finalizado con {stats.failed} fallos. Vuelve a ejecutar el script para reintentarlos.\033[0m")
+            print("--- Script finalizado con errores ---")
+            return
 
+        journal.close(remove=True)
         print("\n\033[92mProceso de eliminación completado.\033[0m")
         print("--- Script finalizado con éxito ---")
 
     except ClientError as e:
+        journal.close()
+        stats.report()
         print(f"\n\033[91mERROR durante la operación: {e.response['Error']['Message']}\033[0m")
+        print(f"El progreso quedó guardado en '{journal.path}'. Vuelve a ejecutar el script para reanudar.")
         print("--- Script finalizado con errores ---")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elimina todos los usuarios del User Pool de Cognito configurado.")
+    parser.add_argument('--rate', type=float, default=DELETE_RATE_PER_SECOND, help="Solicitudes AdminDeleteUser por segundo.")
+    parser.add_argument('--workers', type=int, default=DELETE_WORKERS, help="Hilos de eliminación concurrentes.")
+    args = parser.parse_args()
+
     # Preguntar al usuario por una confirmación final antes de proceder.
     confirm = input("\n\033[93mADVERTENCIA: Este script eliminará PERMANENTEMENTE a TODOS los usuarios del User Pool configurado. Esta acción no se puede deshacer.\033[0m\n¿Estás absolutamente seguro de que quieres continuar? (escribe 'eliminar' para confirmar): ")
     if confirm.lower() == 'eliminar':
-        delete_all_cognito_users()
+        delete_all_cognito_users(args.rate, args.workers)
     else:
         print("\nOperación cancelada por el usuario.")
         print("--- Script finalizado ---")
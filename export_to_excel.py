@@ -7,6 +7,8 @@ from openpyxl.utils import get_column_letter
 from PIL import Image as PILImage
 from dotenv import load_dotenv
 import io
+import json
+from decimal import Decimal, InvalidOperation
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -16,51 +18,137 @@ OUTPUT_FILE = "participaciones_export.xlsx"
 IMAGE_WIDTH = 240
 IMAGE_HEIGHT = 150
 
-def get_all_items_from_dynamodb(table_name, dynamodb_client):
+# --- Esquema declarado de atributos numéricos de participación ---
+# Los atributos 'N' que no aparecen aquí se decodifican como Decimal para no perder precisión.
+NUMBER_SCHEMA = {
+    'cantidad_intentos_rut': int,
+    'tiempo_deteccion_rut': float,
+}
+
+# Marcador para celdas de ítems que no tienen el atributo (distinto de un NULL de DynamoDB).
+MISSING = object()
+
+def scan_table_pages(table_name, dynamodb_client):
     """
-    Extrae todos los items de una tabla de DynamoDB usando paginación.
+    Genera las páginas de un scan completo de la tabla sin acumularlas en memoria.
     """
-    items = []
+    paginator = dynamodb_client.get_paginator('scan')
+    return paginator.paginate(TableName=table_name, PaginationConfig={'PageSize': 100})
+
+def _print_scan_error(table_name, e):
+    if e.response['Error']['Code'] == 'ResourceNotFoundException':
+        print(f"Error Crítico: La tabla '{table_name}' no fue encontrada en la región configurada.")
+    else:
+        print(f"Error de AWS al escanear la tabla: {e}")
+
+# --- Deserialización de tipos de DynamoDB ---
+def _to_number(raw, number_type=Decimal):
     try:
-        paginator = dynamodb_client.get_paginator('scan')
-        page_iterator = paginator.paginate(TableName=table_name, PaginationConfig={'PageSize': 100})
-        for page in page_iterator:
-            items.extend(page['Items'])
-        print(f"Se encontraron {len(items)} registros en la tabla '{table_name}'.")
-        return items
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'ResourceNotFoundException':
-            print(f"Error Crítico: La tabla '{table_name}' no fue encontrada en la región configurada.")
-        else:
-            print(f"Error de AWS al escanear la tabla: {e}")
+        return number_type(raw)
+    except (ValueError, TypeError, InvalidOperation):
+        try:
+            return Decimal(raw)
+        except (ValueError, TypeError, InvalidOperation):
+            return raw
+
+def _decode_value(value, number_type=Decimal):
+    for data_type, val in value.items():
+        if data_type == 'S' or data_type == 'BOOL':
+            return val
+        if data_type == 'N':
+            return _to_number(val, number_type)
+        if data_type == 'NULL':
+            return None
+        if data_type == 'M':
+            return {k: _decode_value(v) for k, v in val.items()}
+        if data_type == 'L':
+            return [_decode_value(v) for v in val]
+        if data_type == 'SS' or data_type == 'BS':
+            return set(val)
+        if data_type == 'NS':
+            return {_to_number(v) for v in val}
+        if data_type == 'B':
+            return val
+        return str(val)
+    return None
+
+def _build_decoder(number_type):
+    """
+    Crea el decodificador de un atributo. El tipo numérico se resuelve una sola vez por columna.
+    """
+    def decode(value):
+        for data_type, val in value.items():
+            if data_type == 'S' or data_type == 'BOOL':
+                return val
+            if data_type == 'N':
+                return _to_number(val, number_type)
+            return _decode_value(value)
         return None
+    return decode
 
-def deserialize_dynamodb_item(item):
+def deserialize_dynamodb_item(item, number_schema=NUMBER_SCHEMA):
     """
     Convierte un item de DynamoDB (con tipos de datos) a un diccionario de Python simple.
     """
-    deserialized = {}
-    for key, value in item.items():
-        data_type = list(value.keys())[0]
-        val = value[data_type]
-        
-        if data_type == 'S':
-            deserialized[key] = val
-        elif data_type == 'N':
-            try:
-                deserialized[key] = int(val)
-            except (ValueError, TypeError):
-                try:
-                    deserialized[key] = float(val)
-                except (ValueError, TypeError):
-                    deserialized[key] = val
-        elif data_type == 'BOOL':
-            deserialized[key] = val
-        elif data_type == 'NULL':
-            deserialized[key] = None
-        else:
-            deserialized[key] = str(val)
-    return deserialized
+    return {key: _decode_value(value, number_schema.get(key, Decimal)) for key, value in item.items()}
+
+def _decode_column(raw_values, number_type=Decimal):
+    """
+    Decodifica una columna completa. Si todos los valores comparten el tipo del
+    primero se usa una comprensión especializada; si no, se decodifica valor a valor.
+    """
+    data_type = next((t for v in raw_values if v is not MISSING for t in v), None)
+    try:
+        if data_type == 'S' or data_type == 'BOOL':
+            return [v[data_type] for v in raw_values]
+        if data_type == 'N':
+            return [number_type(v['N']) for v in raw_values]
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        pass
+    decode = _build_decoder(number_type)
+    return [MISSING if v is MISSING else decode(v) for v in raw_values]
+
+def deserialize_pages_columnar(pages, number_schema=NUMBER_SCHEMA):
+    """
+    Deserializa páginas de un scan directamente a columnas.
+
+    Devuelve (cantidad_de_filas, columnas), donde columnas es un diccionario
+    {atributo: [valor_fila_0, valor_fila_1, ...]}. Las filas que no tienen un
+    atributo contienen MISSING en esa posición. Los encabezados se obtienen de
+    las claves de columnas, sin recorrer los ítems una segunda vez.
+    """
+    # 1. Repartir los valores crudos por columna (solo referencias, sin decodificar).
+    raw_columns = {}
+    appenders = {}
+    row_count = 0
+    for page in pages:
+        for item in page.get('Items', []):
+            for key, value in item.items():
+                append = appenders.get(key)
+                if append is None:
+                    column = raw_columns[key] = [MISSING] * row_count
+                    append = appenders[key] = column.append
+                append(value)
+            row_count += 1
+            # Solo se rellenan huecos cuando el ítem no trae todas las columnas conocidas.
+            if len(item) != len(raw_columns):
+                for column in raw_columns.values():
+                    if len(column) < row_count:
+                        column.append(MISSING)
+
+    # 2. Decodificar cada columna de una vez según el esquema declarado.
+    columns = {key: _decode_column(raw_values, number_schema.get(key, Decimal)) for key, raw_values in raw_columns.items()}
+    return row_count, columns
+
+def _format_cell_value(value):
+    # Formateo especial para booleanos
+    if isinstance(value, bool):
+        return "Sí" if value else "No"
+    if isinstance(value, (dict, list, set)):
+        return json.dumps(sorted(value, key=str) if isinstance(value, set) else value, default=str, ensure_ascii=False)
+    if isinstance(value, bytes):
+        return value.hex()
+    return value
 
 def export_to_excel():
     """
@@ -84,28 +172,25 @@ def export_to_excel():
         print("Error de Autenticación: Credenciales de AWS no encontradas.")
         return
 
-    # 2. Extracción y Deserialización de Datos
-    items_raw = get_all_items_from_dynamodb(table_name, dynamodb_client)
-    if items_raw is None:
+    # 2. Extracción y Deserialización de Datos (por páginas, directo a columnas)
+    try:
+        row_count, columns = deserialize_pages_columnar(scan_table_pages(table_name, dynamodb_client))
+    except ClientError as e:
+        _print_scan_error(table_name, e)
         print("La exportación ha fallado debido a un error con DynamoDB.")
         return
-    if not items_raw:
+    if not row_count:
         print("No se encontraron datos para exportar.")
         return
 
-    processed_items = [deserialize_dynamodb_item(item) for item in items_raw]
-    print(f"Total de filas a exportar: {len(processed_items)}")
+    print(f"Total de filas a exportar: {row_count}")
 
     # 3. Creación Dinámica de Encabezados
-    all_keys = set()
-    for item in processed_items:
-        all_keys.update(item.keys())
-    
     # Mover columnas de imágenes al final
     image_headers = ["Imagen Frontal", "Imagen Trasera"]
     url_headers = ["url_img_frontal", "url_img_trasera"]
     
-    data_headers = sorted([key for key in all_keys if key not in url_headers])
+    data_headers = sorted([key for key in columns if key not in url_headers])
     final_headers = data_headers + url_headers + image_headers
 
     # 4. Creación del Libro de Excel
@@ -115,6 +200,10 @@ def export_to_excel():
     ws.append(final_headers)
 
     header_to_col_idx = {header: i for i, header in enumerate(final_headers, 1)}
+    missing_column = [MISSING] * row_count
+    data_columns = [(header_to_col_idx[header], columns.get(header, missing_column)) for header in data_headers + url_headers]
+    frontal_urls = columns.get("url_img_frontal", missing_column)
+    trasera_urls = columns.get("url_img_trasera", missing_column)
 
     # Ajustar ancho de columnas
     for col_idx, header in enumerate(final_headers, 1):
@@ -125,31 +214,27 @@ def export_to_excel():
              ws.column_dimensions[col_letter].width = max(len(str(header)) + 2, 20)
 
     # 5. Llenado de Filas y Imágenes
-    for row_idx, item in enumerate(processed_items, start=2):
+    for row_offset in range(row_count):
+        row_idx = row_offset + 2
         ws.row_dimensions[row_idx].height = IMAGE_HEIGHT * 0.75
         
         # Llenar datos dinámicamente
-        for header, col_idx in header_to_col_idx.items():
-            if header in item:
-                value = item[header]
-                # Formateo especial para booleanos
-                if isinstance(value, bool):
-                    value = "Sí" if value else "No"
-                ws.cell(row=row_idx, column=col_idx, value=value)
-            else:
-                # Dejar en blanco si el item no tiene esa clave (excepto para las columnas de imagen)
-                if header not in image_headers:
-                    ws.cell(row=row_idx, column=col_idx, value="N/A")
+        for col_idx, column in data_columns:
+            value = column[row_offset]
+            if value is MISSING:
+                # Dejar "N/A" si el item no tiene esa clave
+                value = "N/A"
+            ws.cell(row=row_idx, column=col_idx, value=_format_cell_value(value))
 
         # Incrustar imágenes
         image_urls = {
-            header_to_col_idx["Imagen Frontal"]: item.get("url_img_frontal"), 
-            header_to_col_idx["Imagen Trasera"]: item.get("url_img_trasera")
+            header_to_col_idx["Imagen Frontal"]: frontal_urls[row_offset], 
+            header_to_col_idx["Imagen Trasera"]: trasera_urls[row_offset]
         }
 
         for col_num, img_url in image_urls.items():
             cell_coordinate = get_column_letter(col_num) + str(row_idx)
-            if not img_url or img_url == "N/A":
+            if img_url is MISSING or not img_url or img_url == "N/A":
                 ws[cell_coordinate] = "URL no disponible"
                 continue
 
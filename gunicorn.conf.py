@@ -0,0 +1,50 @@
+import os
+import multiprocessing
+
+# --- Configuración de gunicorn para producción ---
+# Uso: ./prodserver.sh  (equivale a: gunicorn -c gunicorn.conf.py main:app)
+#
+# Las rutas livianas (formulario, login, save_data) las atienden hilos en pocos workers;
+# el OCR de /validate_rut corre en un pool de procesos aparte dentro de cada worker
+# (ver ocr_pool.py), de modo que la suma de procesos de OCR no supere los núcleos.
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', max(1, min(4, cpu_count // 2))))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# Límites del pool de OCR de cada worker, derivados de sus hilos: OCR_WORKERS + OCR_MAX_QUEUE
+# deja OCR_RESERVED_THREADS hilos libres para las rutas livianas. main.create_app los lee del
+# entorno y rechaza una configuración que no deje hilos libres.
+os.environ['WEB_THREADS'] = str(threads)
+os.environ.setdefault('OCR_RESERVED_THREADS', '2')
+_ocr_slots = max(1, threads - int(os.environ['OCR_RESERVED_THREADS']))
+os.environ.setdefault('OCR_WORKERS', str(min(_ocr_slots, max(1, cpu_count // workers))))
+os.environ.setdefault('OCR_MAX_QUEUE', str(max(0, _ocr_slots - int(os.environ['OCR_WORKERS']))))
+
+# La app se carga una vez en el master (sin OpenCV: el OCR se importa solo en el pool)
+# y se comparte por copy-on-write. Los pools de OCR se crean en el primer uso en cada worker.
+preload_app = True
+# El manifiesto de assets también se construye en el master y lo heredan los workers.
+os.environ.setdefault('ASSETS_BUILD_ON_STARTUP', '1')
+
+# Reciclaje de workers para contener el crecimiento de memoria, escalonado con jitter.
+max_requests = 1000
+max_requests_jitter = 100
+
+# Una validación con varias rotaciones puede tardar; timeout holgado y cierre ordenado.
+timeout = 120
+graceful_timeout = 60
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+def worker_exit(server, worker):
+    # Cierra el pool de OCR del worker para no dejar procesos huérfanos.
+    from main import app
+    ocr_pool = app.extensions.get('ocr_pool')
+    if ocr_pool is not None:
+        ocr_pool.shutdown(wait=False)
@@ -1,31 +1,32 @@
 
 import os
 import re
-import boto3
 import json
 import requests
 import base64
 import logging
 import time
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+import threading
+import uuid
+from flask import Flask, current_app, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory
 from dotenv import load_dotenv
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from botocore.exceptions import ClientError
+from ocr_pool import OcrPool, OcrPoolSaturated
+from assets import AssetManifest, ENCODINGS, IMMUTABLE_CACHE_CONTROL, guess_mimetype
+from rut import normalize_rut
+from user_units import parse_user_units
 
 # --- Librerías de Procesamiento de Imagen ---
-import cv2
-import pytesseract
-import numpy as np
+# OpenCV y Tesseract viven en ocr.py y se importan recién en la primera
+# validación de RUT, para que el arranque de cada worker no pague ese costo.
 
 # --- Configuración del Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 load_dotenv()
 
-app = Flask(__name__, static_folder='static', static_url_path='/static')
-app.jinja_env.add_extension('jinja2.ext.do')
-
 # --- Función para obtener y limpiar variables de entorno ---
 def get_env_variable(var_name, default=None):
     value = os.getenv(var_name, default)
@@ -33,22 +34,15 @@ def get_env_variable(var_name, default=None):
         return value.strip()
     return value
 
-# --- Clave Secreta ---
-app.secret_key = get_env_variable('SECRET_KEY')
-if not app.secret_key:
-    raise ValueError("No se ha configurado la SECRET_KEY en las variables de entorno.")
-
 # --- Configuraciones ---
 UPLOAD_FOLDER = 'static/uploads'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-# --- Clientes de Servicios AWS ---
-dynamodb_client = boto3.client(
-    'dynamodb',
-    region_name=get_env_variable('AWS_DEFAULT_REGION')
-)
+# Respuestas que nunca deben guardarse en caché (páginas y API). Los assets estáticos
+# se cachean según tengan huella de contenido o no (ver static_asset).
+NO_STORE_MIMETYPES = {'text/html', 'application/json'}
+# Límite de ítems por llamada a transact_write_items.
+MAX_TRANSACTION_ITEMS = 100
+VOTE_CONDITION_EXPRESSION = 'attribute_not_exists(cognito_sub) AND attribute_not_exists(unidad)'
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
 
 # --- Variables de Entorno Limpias ---
 CLIENT_ID = get_env_variable('COGNITO_CLIENT_ID')
@@ -57,12 +51,33 @@ COGNITO_DOMAIN = get_env_variable('COGNITO_DOMAIN')
 REDIRECT_URI = get_env_variable('COGNITO_REDIRECT_URI')
 TABLE_NAME = get_env_variable('DYNAMODB_TABLE_NAME', 'user_participations')
 
+# --- Clientes de Servicios AWS ---
+_aws_clients_lock = threading.Lock()
+
+def get_dynamodb_client():
+    """
+    Devuelve el cliente de DynamoDB de la aplicación actual. boto3 se importa y el cliente
+    se crea en el primer uso (ambos cargan modelos de servicio y son costosos).
+    """
+    client = current_app.extensions.get('dynamodb_client')
+    if client is None:
+        import boto3
+        with _aws_clients_lock:
+            client = current_app.extensions.get('dynamodb_client')
+            if client is None:
+                client = current_app.extensions['dynamodb_client'] = boto3.client(
+                    'dynamodb',
+                    region_name=current_app.config['AWS_DEFAULT_REGION']
+                )
+    return client
+
 # --- MIDDLEWARE ---
-@app.after_request
 def add_headers(response):
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '-1'
+    # Las fotos de cédulas subidas tampoco se cachean: contienen datos personales.
+    if response.mimetype in NO_STORE_MIMETYPES or request.path.startswith('/static/uploads/'):
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '-1'
     response.headers['Accept-CH'] = 'Sec-CH-UA, Sec-CH-UA-Mobile, Sec-CH-UA-Platform, Sec-CH-UA-Arch, Sec-CH-UA-Model'
     return response
 
@@ -76,11 +91,6 @@ def get_user_from_session():
         return json.loads(base64.urlsafe_b64decode(payload_b64))
     except Exception: return None
 
-def normalize_rut(rut):
-    if not rut:
-        return ""
-    return re.sub(r'[^0-9kK]', '', str(rut)).upper()
-
 def save_and_get_url(file, base_filename):
     if not file or not file.filename:
         return None, "No se proporcionó ningún archivo"
@@ -88,9 +98,11 @@ def save_and_get_url(file, base_filename):
     _, extension = os.path.splitext(file.filename)
     timestamp = int(datetime.utcnow().timestamp())
     filename = secure_filename(f"{base_filename}_{timestamp}{extension}")
-    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    path = os.path.join(upload_folder, filename)
     
     try:
+        os.makedirs(upload_folder, exist_ok=True)
         file.save(path)
         url = url_for('static', filename=f'uploads/{filename}')
         logging.info(f"Archivo guardado como '{filename}'. URL: {url}")
@@ -99,75 +111,30 @@ def save_and_get_url(file, base_filename):
         logging.error(f"Error al guardar el archivo: {e}", exc_info=True)
         return None, f"Error interno al guardar el archivo."
 
-def _find_rut_from_text_block(text_block):
-    rut_pattern = r'(\d{1,2}[., ]?\d{3}[., ]?\d{3}[- ]?[dkK\d])'
-    matches = re.findall(rut_pattern, text_block)
-    for potential_rut in matches:
-        normalized = normalize_rut(potential_rut)
-        if 8 <= len(normalized) <= 9:
-            logging.info(f"RUT válido encontrado: '{normalized}' (de '{potential_rut}')")
-            return normalized
-    return None
-
 def extract_rut_from_image(image_path):
-    try:
-        logging.info(f"Iniciando extracción de RUT desde: {image_path}")
-        original_image = cv2.imread(image_path)
-        if original_image is None: return None
-
-        for angle in [0, 90, 180, 270]:
-            logging.info(f"--- Probando con rotación de {angle} grados ---")
-            if angle == 0: rotated_image = original_image
-            else: rotated_image = cv2.rotate(original_image, cv2.ROTATE_90_CLOCKWISE if angle == 90 else (cv2.ROTATE_180 if angle == 180 else cv2.ROTATE_90_COUNTERCLOCKWISE))
-
-            gray = cv2.cvtColor(rotated_image, cv2.COLOR_BGR2GRAY)
-            resized = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-            blurred = cv2.GaussianBlur(resized, (5, 5), 0)
-            _, processed_image = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            full_text = pytesseract.image_to_string(processed_image, lang='spa', config='--oem 3 --psm 3')
-            logging.info(f"Texto extraído (rotación {angle}°): \"{full_text[:250].replace('\n', ' ')}...\"")
-
-            anchor_pattern = r'(RUN)'
-            anchor_match = re.search(anchor_pattern, full_text, re.IGNORECASE)
-            if anchor_match:
-                logging.info("Ancla 'RUN' encontrada. Buscando RUT.")
-                start_index = anchor_match.end()
-                search_block = full_text[start_index : start_index + 80]
-                rut = _find_rut_from_text_block(search_block)
-                if rut:
-                    logging.info(f"¡ÉXITO! RUT encontrado con ancla en rotación {angle}°.")
-                    return rut
-            else:
-                logging.info(f"Ancla 'RUN' no encontrada en rotación {angle}°.")
-        
-        logging.warning("Ancla 'RUN' no fue detectada. Intentando sin ancla como último recurso.")
-        rut = _find_rut_from_text_block(full_text)
-        if rut: return rut
-
-        logging.error("No se encontró un RUT procesable en ninguna orientación.")
-        return None
-    except Exception as e:
-        logging.error(f"Error en pipeline de OCR: {e}", exc_info=True)
-        return None
+    # Con OCR_WORKERS > 0 (servidor de producción) el OCR corre en el pool de procesos dedicado;
+    # si no, en el mismo proceso con importación diferida del stack de OCR (OpenCV/Tesseract).
+    ocr_pool = current_app.extensions.get('ocr_pool')
+    if ocr_pool is not None:
+        return ocr_pool.extract_rut(image_path, timeout=current_app.config['OCR_TIMEOUT'])
+    from ocr import extract_rut_from_image as _extract_rut_from_image
+    return _extract_rut_from_image(image_path)
+
+def check_ocr_capacity():
+    # Se consulta antes de guardar las imágenes: una solicitud rechazada no debe dejar fotos en disco.
+    ocr_pool = current_app.extensions.get('ocr_pool')
+    if ocr_pool is not None:
+        ocr_pool.check_capacity()
 
 def get_pending_units(user_attributes, use_consistent_read=False):
     if not user_attributes or 'sub' not in user_attributes:
         return [], [], []
-    cognito_units_str = user_attributes.get('custom:Unidad', '')
-    cognito_types_str = user_attributes.get('custom:TipoUnidad', '')
-    unit_numbers = [u.strip() for u in cognito_units_str.split(',') if u.strip()]
-    unit_types = [t.strip() for t in cognito_types_str.split(',') if t.strip()]
-    if len(unit_numbers) > 1 and len(unit_types) == 1:
-        unit_types = unit_types * len(unit_numbers)
-    if len(unit_numbers) != len(unit_types):
-        logging.error(f"Discordancia en datos de Cognito para {user_attributes.get('sub')}")
-        return [], [], []
-    all_units_structured = [{'tipo_unidad': type, 'unidad': num} for type, num in zip(unit_types, unit_numbers)]
+    all_units_structured = parse_user_units(user_attributes)
     if not all_units_structured: return [], [], []
 
     voted_units_keys = set()
     try:
-        paginator = dynamodb_client.get_paginator('query')
+        paginator = get_dynamodb_client().get_paginator('query')
         query_args = {
             'TableName': TABLE_NAME,
             'KeyConditionExpression': 'cognito_sub = :sub',
@@ -188,7 +155,6 @@ def get_pending_units(user_attributes, use_consistent_read=False):
     return pending_structured, voted_structured, all_units_structured
 
 # --- Rutas de Flask ---
-@app.route('/')
 def index():
     user = get_user_from_session()
     if not user:
@@ -202,13 +168,11 @@ def index():
     if not pending_units: return render_template('index.html', user=user, user_has_voted=True, voted_units=voted_units)
     return redirect(url_for('form'))
 
-@app.route('/login')
 def login():
     scopes = "openid+email+profile"
     cognito_login_url = f"https://{COGNITO_DOMAIN}/login?client_id={CLIENT_ID}&response_type=code&scope={scopes}&redirect_uri={REDIRECT_URI}&ui_locales=es&lang=es"
     return redirect(cognito_login_url)
 
-@app.route('/callback')
 def callback():
     code = request.args.get('code')
     if not code:
@@ -238,14 +202,12 @@ def callback():
         
     return redirect(url_for('index'))
 
-@app.route('/logout')
 def logout():
     session.clear()
     logout_uri = url_for('callback', _external=True)
     cognito_logout_url = f"https://{COGNITO_DOMAIN}/logout?client_id={CLIENT_ID}&logout_uri={logout_uri}"
     return redirect(cognito_logout_url)
 
-@app.route('/form')
 def form():
     user = get_user_from_session()
     if not user: return redirect(url_for('login'))
@@ -258,13 +220,14 @@ def form():
         return redirect(url_for('index'))
     return render_template('form.html', user=user, pending_units=pending_units, voted_units=voted_units)
 
-@app.route('/validate_rut', methods=['POST'])
 def validate_rut():
     start_time = time.time()
+    saved_paths = []
     try:
         user = get_user_from_session()
         if not user: return jsonify({'error': 'No autorizado'}), 401
         if 'id_frontal' not in request.files: return jsonify({'error': 'Falta la imagen frontal.'}), 400
+        check_ocr_capacity()
 
         user_rut_cognito = normalize_rut(user.get('custom:Rut'))
         rut_for_filename = re.sub(r'[^0-9]', '', user_rut_cognito)
@@ -273,12 +236,14 @@ def validate_rut():
         base_filename_frontal = f"{rut_for_filename}_frontal"
         url_frontal, path_frontal = save_and_get_url(img_frontal_file, base_filename_frontal)
         if not url_frontal: return jsonify({'error': path_frontal}), 500
+        saved_paths.append(path_frontal)
 
         url_trasera = 'N/A'
         if 'id_trasera' in request.files and request.files['id_trasera'].filename != '':
             img_trasera_file = request.files['id_trasera']
             base_filename_trasera = f"{rut_for_filename}_trasera"
-            url_trasera, _ = save_and_get_url(img_trasera_file, base_filename_trasera)
+            url_trasera, path_trasera = save_and_get_url(img_trasera_file, base_filename_trasera)
+            if url_trasera: saved_paths.append(path_trasera)
         
         extracted_rut = extract_rut_from_image(path_frontal)
         rut_match_success = bool(extracted_rut and extracted_rut == user_rut_cognito)
@@ -303,21 +268,101 @@ def validate_rut():
         session.modified = True
         
         return jsonify({'success': True, 'rut_match': rut_match_success, 'extracted_rut': extracted_rut or 'No se pudo extraer', 'user_rut': user_rut_cognito})
+    except OcrPoolSaturated:
+        logging.warning("Pool de OCR saturado; se rechaza la validación.")
+        # El pool pudo llenarse entre la verificación y el OCR: no se conservan las fotos rechazadas.
+        for path in saved_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return jsonify({'error': 'El servidor está procesando muchas validaciones. Inténtalo de nuevo en unos segundos.'}), 503
     except Exception as e:
         logging.error(f"Error en /validate_rut: {e}", exc_info=True)
         return jsonify({'error': 'Error inesperado en el servidor.'}), 500
 
-@app.route('/save_data', methods=['POST'])
+def _transaction_token(user_sub, idempotency_key, chunk_index, attempt):
+    # ClientRequestToken admite hasta 36 caracteres: se deriva un UUID estable por lote e intento.
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_sub}:{idempotency_key}:{chunk_index}:{attempt}"))
+
+def _find_voted_units(client, user_sub, units):
+    """Lectura consistente de cuáles de las unidades (hasta 100) ya tienen voto registrado."""
+    keys = [{'cognito_sub': {'S': user_sub}, 'unidad': {'S': unit['unidad']}} for unit in units]
+    request_items = {TABLE_NAME: {'Keys': keys, 'ConsistentRead': True, 'ProjectionExpression': 'unidad'}}
+    voted = set()
+    while request_items:
+        response = client.batch_get_item(RequestItems=request_items)
+        voted.update(item['unidad']['S'] for item in response.get('Responses', {}).get(TABLE_NAME, []))
+        request_items = response.get('UnprocessedKeys') or {}
+    return voted
+
+def commit_vote(units, build_item, user_sub, idempotency_key):
+    """
+    Registra el voto de cada unidad sin leer antes la tabla: cada Put es condicional y el
+    lote se envía con un ClientRequestToken derivado de la clave de idempotencia del cliente,
+    por lo que reintentar la misma solicitud no duplica votos.
+
+    Las unidades se envían en lotes de hasta 100 (límite de transact_write_items). Si un lote
+    se cancela, CancellationReasons indica qué unidades ya tenían voto y el resto se reenvía.
+    Un reintento con la misma clave nunca repite exactamente los mismos datos (p. ej.
+    timestamp_votacion), así que IdempotentParameterMismatchException se confirma con una
+    lectura consistente antes de dar las unidades por votadas.
+    Devuelve (unidades_registradas, unidades_ya_votadas).
+    """
+    committed, already_voted = [], []
+    client = get_dynamodb_client()
+    for chunk_index, start in enumerate(range(0, len(units), MAX_TRANSACTION_ITEMS)):
+        chunk = units[start:start + MAX_TRANSACTION_ITEMS]
+        attempt = 0
+        while chunk:
+            transaction_items = [
+                {'Put': {'TableName': TABLE_NAME, 'Item': build_item(unit), 'ConditionExpression': VOTE_CONDITION_EXPRESSION}}
+                for unit in chunk
+            ]
+            try:
+                client.transact_write_items(
+                    TransactItems=transaction_items,
+                    ClientRequestToken=_transaction_token(user_sub, idempotency_key, chunk_index, attempt)
+                )
+                committed.extend(chunk)
+                break
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code == 'IdempotentParameterMismatchException':
+                    # El token ya se usó con otros datos: solo cuentan como votadas las unidades que
+                    # efectivamente están en la tabla; el resto se reenvía con un token nuevo.
+                    voted = _find_voted_units(client, user_sub, chunk)
+                    already_voted.extend(unit for unit in chunk if unit['unidad'] in voted)
+                    chunk = [unit for unit in chunk if unit['unidad'] not in voted]
+                    attempt += 1
+                    continue
+                if code != 'TransactionCanceledException':
+                    raise
+                reasons = e.response.get('CancellationReasons', [])
+                conflicted = [unit for unit, reason in zip(chunk, reasons) if reason.get('Code') == 'ConditionalCheckFailed']
+                if not conflicted:
+                    # Cancelación por otra causa (conflicto de transacción, throttling): no se puede resolver aquí.
+                    raise
+                logging.info(f"Unidades ya votadas para {user_sub}: {[unit['unidad'] for unit in conflicted]}")
+                already_voted.extend(conflicted)
+                chunk = [unit for unit, reason in zip(chunk, reasons) if reason.get('Code') != 'ConditionalCheckFailed']
+                attempt += 1
+    return committed, already_voted
+
 def save_data():
     user = get_user_from_session()
     if not user: return jsonify({'error': 'No autorizado'}), 401
-    pending_units, _, _ = get_pending_units(user, use_consistent_read=True)
-    if not pending_units: return jsonify({'success': True, 'message': 'Tu voto ya fue registrado.'})
-
-    data = request.json
-    validation_data = session.pop('validation_data', {})
-    timestamp_login = session.pop('timestamp_login', 'N/A')
-    rut_stats = session.pop('rut_validation_stats', {})
+    all_units = parse_user_units(user)
+    if not all_units: return jsonify({'error': 'No tiene unidades asignadas para votar.'}), 400
+
+    data = request.get_json(silent=True) or {}
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or ''
+    if not IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+        idempotency_key = uuid.uuid4().hex
+    validation_data = session.get('validation_data', {})
+    timestamp_login = session.get('timestamp_login', 'N/A')
+    rut_stats = session.get('rut_validation_stats', {})
+    timestamp_votacion = datetime.utcnow().isoformat()
 
     # --- Captura y Procesamiento de Datos de Identificación ---
     ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
@@ -329,64 +374,158 @@ def save_data():
     sec_ch_ua_arch = request.headers.get('Sec-CH-UA-Arch', 'N/A')
     sec_ch_ua_model = request.headers.get('Sec-CH-UA-Model', 'N/A')
 
-    try:
-        transaction_items = []
-        for unit_data in pending_units:
-            item = {
-                'cognito_sub': {'S': user.get('sub')},
-                'username': {'S': user.get('cognito:username', 'N/A')},
-                'nombre': {'S': user.get('custom:Nombre', 'N/A')},
-                'rut': {'S': user.get('custom:Rut', 'N/A')},
-                'email': {'S': user.get('email', 'N/A')},
-                'unidad': {'S': unit_data['unidad']},
-                'tipo_unidad': {'S': unit_data['tipo_unidad']},
-                'comunidad': {'S': user.get('custom:Comunidad', 'N/A')},
-                'decision_reglamento': {'S': data.get('final_answer', 'N/A').title()},
-                'timestamp_votacion': {'S': datetime.utcnow().isoformat()},
-                'rut_match_success': {'BOOL': validation_data.get('rut_match_success', False)},
-                'rut_detectado_imagen': {'S': validation_data.get('rut_detectado_imagen', 'N/A')},
-                'url_img_frontal': {'S': validation_data.get('url_img_frontal', 'N/A')},
-                'url_img_trasera': {'S': validation_data.get('url_img_trasera', 'N/A')},
-                
-                'user_agent': {'S': request.user_agent.string},
-                'ip_address': {'S': ip_address},
-                'accept_language': {'S': accept_language},
-                'device_type': {'S': device_type},
-                'sec_ch_ua': {'S': sec_ch_ua},
-                'sec_ch_ua_platform': {'S': sec_ch_ua_platform},
-                'sec_ch_ua_arch': {'S': sec_ch_ua_arch},
-                'sec_ch_ua_model': {'S': sec_ch_ua_model},
-
-                'timestamp_login': {'S': timestamp_login},
-                'timestamp_validacion': {'S': rut_stats.get('timestamp_validacion', 'N/A')},
-                'cantidad_intentos_rut': {'N': str(rut_stats.get('cantidad_intentos_rut', 1))},
-                'tiempo_deteccion_rut': {'N': str(rut_stats.get('tiempo_deteccion_rut', 0))}
-            }
-            transaction_items.append({
-                'Put': {
-                    'TableName': TABLE_NAME,
-                    'Item': item,
-                    'ConditionExpression': 'attribute_not_exists(cognito_sub) AND attribute_not_exists(unidad)'
-                }
-            })
-
-        if transaction_items: dynamodb_client.transact_write_items(TransactItems=transaction_items)
-        session['voto_recien_emitido'] = pending_units
-        session.modified = True
-        return jsonify({'success': True, 'message': "¡Tu voto ha sido guardado con éxito!"})
+    def build_item(unit_data):
+        return {
+            'cognito_sub': {'S': user.get('sub')},
+            'username': {'S': user.get('cognito:username', 'N/A')},
+            'nombre': {'S': user.get('custom:Nombre', 'N/A')},
+            'rut': {'S': user.get('custom:Rut', 'N/A')},
+            'email': {'S': user.get('email', 'N/A')},
+            'unidad': {'S': unit_data['unidad']},
+            'tipo_unidad': {'S': unit_data['tipo_unidad']},
+            'comunidad': {'S': user.get('custom:Comunidad', 'N/A')},
+            'decision_reglamento': {'S': data.get('final_answer', 'N/A').title()},
+            'timestamp_votacion': {'S': timestamp_votacion},
+            'rut_match_success': {'BOOL': validation_data.get('rut_match_success', False)},
+            'rut_detectado_imagen': {'S': validation_data.get('rut_detectado_imagen', 'N/A')},
+            'url_img_frontal': {'S': validation_data.get('url_img_frontal', 'N/A')},
+            'url_img_trasera': {'S': validation_data.get('url_img_trasera', 'N/A')},
+            
+            'user_agent': {'S': request.user_agent.string},
+            'ip_address': {'S': ip_address},
+            'accept_language': {'S': accept_language},
+            'device_type': {'S': device_type},
+            'sec_ch_ua': {'S': sec_ch_ua},
+            'sec_ch_ua_platform': {'S': sec_ch_ua_platform},
+            'sec_ch_ua_arch': {'S': sec_ch_ua_arch},
+            'sec_ch_ua_model': {'S': sec_ch_ua_model},
+
+            'timestamp_login': {'S': timestamp_login},
+            'timestamp_validacion': {'S': rut_stats.get('timestamp_validacion', 'N/A')},
+            'cantidad_intentos_rut': {'N': str(rut_stats.get('cantidad_intentos_rut', 1))},
+            'tiempo_deteccion_rut': {'N': str(rut_stats.get('tiempo_deteccion_rut', 0))}
+        }
 
+    try:
+        committed, already_voted = commit_vote(all_units, build_item, user.get('sub'), idempotency_key)
     except ClientError as e:
-        if 'TransactionCanceledException' in str(e):
-            _, voted_units, _ = get_pending_units(user, use_consistent_read=True)
-            session['voto_recien_emitido'] = voted_units
-            session.modified = True
-            return jsonify({'success': True, 'message': 'Tu voto ya ha sido registrado.'})
-        else:
-            logging.error(f"Error de AWS al guardar: {e}", exc_info=True)
-            return jsonify({'error': f'Error de base de datos: {e.response["Error"]["Message"]}'}), 500
+        logging.error(f"Error de AWS al guardar: {e}", exc_info=True)
+        if e.response['Error']['Code'] == 'TransactionCanceledException':
+            return jsonify({'error': 'No se pudo registrar el voto por una operación concurrente. Inténtalo de nuevo.'}), 409
+        return jsonify({'error': f'Error de base de datos: {e.response["Error"]["Message"]}'}), 500
     except Exception as e:
         logging.error(f"Error inesperado al guardar: {e}", exc_info=True)
         return jsonify({'error': f'Ha ocurrido un error inesperado: {str(e)}'}), 500
 
+    session.pop('validation_data', None)
+    session.pop('timestamp_login', None)
+    session.pop('rut_validation_stats', None)
+    session['voto_recien_emitido'] = sorted(committed + already_voted, key=lambda x: (x['tipo_unidad'], x['unidad']))
+    session.modified = True
+    already_voted_labels = [f"{unit['tipo_unidad']} {unit['unidad']}" for unit in already_voted]
+    if not committed:
+        return jsonify({'success': True, 'message': 'Tu voto ya ha sido registrado.', 'already_voted_units': already_voted_labels})
+    return jsonify({'success': True, 'message': "¡Tu voto ha sido guardado con éxito!", 'already_voted_units': already_voted_labels})
+
+# --- Salud del Servicio ---
+def healthz():
+    """Liveness: el proceso responde."""
+    return jsonify({'status': 'ok'})
+
+def readyz():
+    """Readiness: deja de aceptar tráfico (503) mientras el pool de OCR está saturado."""
+    ocr_pool = current_app.extensions.get('ocr_pool')
+    if ocr_pool is None:
+        return jsonify({'status': 'ready', 'ocr_pool': None})
+    stats = ocr_pool.stats()
+    ready = stats['in_flight'] < stats['capacity']
+    return jsonify({'status': 'ready' if ready else 'saturated', 'ocr_pool': stats}), 200 if ready else 503
+
+# --- Assets Estáticos ---
+def fingerprint_static_url(endpoint, values):
+    """url_for('static', filename='js/form.js') genera la URL con huella de contenido."""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = current_app.extensions['assets'].url_filename(values['filename'])
+
+def static_asset(filename):
+    """
+    Sirve static/. Los nombres con huella se entregan con su variante precomprimida
+    (brotli/gzip según Accept-Encoding) y caché inmutable; el resto se revalida siempre.
+    """
+    manifest = current_app.extensions['assets']
+    original = manifest.resolve(filename)
+    if original is None:
+        response = current_app.send_static_file(filename)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    accepted = {encoding for encoding, _ in ENCODINGS if request.accept_encodings.quality(encoding) > 0}
+    encoding, suffix = manifest.best_variant(original, accepted)
+    response = send_from_directory(current_app.static_folder, original + suffix, mimetype=guess_mimetype(original))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+def register_routes(app):
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/login', 'login', login)
+    app.add_url_rule('/callback', 'callback', callback)
+    app.add_url_rule('/logout', 'logout', logout)
+    app.add_url_rule('/form', 'form', form)
+    app.add_url_rule('/validate_rut', 'validate_rut', validate_rut, methods=['POST'])
+    app.add_url_rule('/save_data', 'save_data', save_data, methods=['POST'])
+    app.add_url_rule('/healthz', 'healthz', healthz)
+    app.add_url_rule('/readyz', 'readyz', readyz)
+
+# --- Fábrica de la Aplicación ---
+def create_app(config=None):
+    """
+    Crea y configura la aplicación Flask. Los clientes de AWS se crean en el primer uso
+    (ver get_dynamodb_client) y pueden inyectarse en app.extensions para pruebas.
+    """
+    app = Flask(__name__, static_folder='static', static_url_path='/static')
+    app.jinja_env.add_extension('jinja2.ext.do')
+
+    # --- Clave Secreta ---
+    app.secret_key = get_env_variable('SECRET_KEY')
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['AWS_DEFAULT_REGION'] = get_env_variable('AWS_DEFAULT_REGION')
+    # --- Pool de OCR (0 = OCR en el mismo proceso, como en el servidor de desarrollo) ---
+    app.config['OCR_WORKERS'] = int(get_env_variable('OCR_WORKERS', '0'))
+    app.config['OCR_MAX_QUEUE'] = int(get_env_variable('OCR_MAX_QUEUE', '4'))
+    app.config['OCR_MAX_TASKS_PER_CHILD'] = int(get_env_variable('OCR_MAX_TASKS_PER_CHILD', '200'))
+    app.config['OCR_TIMEOUT'] = float(get_env_variable('OCR_TIMEOUT', '90'))
+    # Assets: con preload (gunicorn) el manifiesto se construye una vez en el proceso maestro,
+    # antes del fork, en lugar de en la primera solicitud de cada worker.
+    app.config['ASSETS_BUILD_ON_STARTUP'] = get_env_variable('ASSETS_BUILD_ON_STARTUP', '0') == '1'
+    app.config['ASSETS_PRECOMPRESS'] = get_env_variable('ASSETS_PRECOMPRESS', '1') == '1'
+    # Hilos por worker de gunicorn (0 = desconocido, p. ej. servidor de desarrollo).
+    app.config['WEB_THREADS'] = int(get_env_variable('WEB_THREADS', '0'))
+    if config:
+        app.config.update(config)
+    if not app.secret_key:
+        raise ValueError("No se ha configurado la SECRET_KEY en las variables de entorno.")
+    if app.config['OCR_WORKERS'] > 0:
+        ocr_capacity = app.config['OCR_WORKERS'] + app.config['OCR_MAX_QUEUE']
+        if app.config['WEB_THREADS'] and ocr_capacity >= app.config['WEB_THREADS']:
+            # Con todos los hilos esperando OCR, las rutas livianas del worker quedarían sin atender
+            # y el pool nunca llegaría a saturarse para rechazar (503) las validaciones.
+            raise ValueError(f"OCR_WORKERS + OCR_MAX_QUEUE ({ocr_capacity}) debe ser menor que los hilos por worker ({app.config['WEB_THREADS']}).")
+        app.extensions['ocr_pool'] = OcrPool(app.config['OCR_WORKERS'], app.config['OCR_MAX_QUEUE'], app.config['OCR_MAX_TASKS_PER_CHILD'])
+
+    app.extensions['assets'] = AssetManifest(app.static_folder, precompress=app.config['ASSETS_PRECOMPRESS'])
+    if app.config['ASSETS_BUILD_ON_STARTUP']:
+        app.extensions['assets'].build()
+    app.url_defaults(fingerprint_static_url)
+    app.view_functions['static'] = static_asset
+
+    app.after_request(add_headers)
+    register_routes(app)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
@@ -0,0 +1,159 @@
+import re
+import time
+import logging
+
+# --- Librerías de Procesamiento de Imagen ---
+import cv2
+import pytesseract
+
+from rut import normalize_rut, is_valid_rut
+
+ROTATIONS = [
+    (0, None),
+    (90, cv2.ROTATE_90_CLOCKWISE),
+    (180, cv2.ROTATE_180),
+    (270, cv2.ROTATE_90_COUNTERCLOCKWISE),
+]
+TESSERACT_CONFIG = '--oem 3 --psm 3'
+
+# --- Puntaje de Candidatos a RUT ---
+RUT_PATTERN = re.compile(r'(?<!\d)(\d{1,2}[., ]?\d{3}[., ]?\d{3}[- ]?[\dkK])(?!\d)')
+ANCHOR_PATTERN = re.compile(r'RUN', re.IGNORECASE)
+# Confusiones típicas de Tesseract en dígitos; se corrigen solo dentro de un candidato.
+OCR_DIGIT_CONFUSIONS = str.maketrans({'O': '0', 'o': '0', 'l': '1', 'I': '1', '|': '1', 'B': '8', 'S': '5', 'Z': '2'})
+# Caracteres después de la ancla 'RUN' dentro de los cuales se espera el número.
+ANCHOR_WINDOW = 80
+# Un RUT encontrado sin la ancla 'RUN' es menos confiable que uno encontrado junto a ella.
+NO_ANCHOR_CONFIDENCE_FACTOR = 0.6
+# Penalización por cada carácter corregido y por un dígito verificador incorrecto.
+REPAIR_CONFIDENCE_FACTOR = 0.9
+INVALID_VERIFIER_CONFIDENCE_FACTOR = 0.3
+# Un candidato con dígito verificador válido y este puntaje detiene el pipeline.
+ACCEPT_CONFIDENCE = 0.5
+
+def _preprocess(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    resized = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    blurred = cv2.GaussianBlur(resized, (5, 5), 0)
+    _, processed_image = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return processed_image
+
+def _ocr_text_and_confidences(processed_image):
+    """
+    Una sola pasada de Tesseract que devuelve el texto (reconstruido por líneas) y, para cada
+    carácter del texto, la confianza de la palabra a la que pertenece (0 a 1, None en separadores).
+    """
+    data = pytesseract.image_to_data(processed_image, lang='spa', config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    lines = {}
+    for i, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        confidence = max(float(data['conf'][i]), 0.0) / 100
+        lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append((word, confidence))
+    text_parts, char_confidences = [], []
+    for words in lines.values():
+        if text_parts:
+            text_parts.append("\n")
+            char_confidences.append(None)
+        for j, (word, confidence) in enumerate(words):
+            if j:
+                text_parts.append(" ")
+                char_confidences.append(None)
+            text_parts.append(word)
+            char_confidences.extend([confidence] * len(word))
+    return "".join(text_parts), char_confidences
+
+def _anchor_factor(anchor_ends, position):
+    """1.0 junto a la ancla 'RUN', decayendo hasta NO_ANCHOR_CONFIDENCE_FACTOR al final de la ventana."""
+    distances = [position - end for end in anchor_ends if 0 <= position - end <= ANCHOR_WINDOW]
+    if not distances:
+        return NO_ANCHOR_CONFIDENCE_FACTOR
+    return 1.0 - (1.0 - NO_ANCHOR_CONFIDENCE_FACTOR) * min(distances) / ANCHOR_WINDOW
+
+def find_rut_candidates(text, char_confidences=None):
+    """
+    Busca candidatos a RUT en el texto de una pasada de OCR y les asigna un puntaje entre 0 y 1:
+    la confianza del carácter menos confiable del candidato, ponderada por la distancia a la
+    ancla 'RUN', las correcciones de confusiones OCR (O/0, l/1, B/8...) y el dígito verificador.
+
+    Devuelve los candidatos (un diccionario por RUT distinto) ordenados de mayor a menor puntaje.
+    """
+    if char_confidences is None:
+        char_confidences = [1.0] * len(text)
+    repaired_text = text.translate(OCR_DIGIT_CONFUSIONS)
+    anchor_ends = [match.end() for match in ANCHOR_PATTERN.finditer(text)]
+    candidates = {}
+    for match in RUT_PATTERN.finditer(repaired_text):
+        start, end = match.span()
+        rut = normalize_rut(match.group())
+        span_confidences = [c for c in char_confidences[start:end] if c is not None]
+        ocr_confidence = min(span_confidences) if span_confidences else 0.0
+        repairs = sum(1 for raw, fixed in zip(text[start:end], repaired_text[start:end]) if raw != fixed)
+        anchor_factor = _anchor_factor(anchor_ends, start)
+        verifier_valid = is_valid_rut(rut)
+        score = ocr_confidence * anchor_factor * REPAIR_CONFIDENCE_FACTOR ** repairs
+        if not verifier_valid:
+            score *= INVALID_VERIFIER_CONFIDENCE_FACTOR
+        if rut not in candidates or score > candidates[rut]['score']:
+            candidates[rut] = {
+                'rut': rut,
+                'score': score,
+                'verifier_valid': verifier_valid,
+                'anchor': anchor_factor > NO_ANCHOR_CONFIDENCE_FACTOR,
+                'repairs': repairs,
+                'raw': text[start:end],
+            }
+    return sorted(candidates.values(), key=lambda c: c['score'], reverse=True)
+
+def extract_rut_with_details(image_path):
+    """
+    Pipeline de OCR con detalle del resultado: prueba las cuatro rotaciones, puntúa los
+    candidatos a RUT de cada pasada y se detiene apenas uno con dígito verificador válido
+    supera ACCEPT_CONFIDENCE. Si ninguno lo supera, devuelve el mejor de todas las rotaciones.
+
+    Devuelve un diccionario con rut, confidence (0 a 1), rotation, anchor, verifier_valid,
+    repairs, passes y elapsed.
+    """
+    start_time = time.perf_counter()
+    result = {'rut': None, 'confidence': 0.0, 'rotation': None, 'anchor': False, 'verifier_valid': False, 'repairs': 0, 'passes': 0, 'elapsed': 0.0}
+    logging.info(f"Iniciando extracción de RUT desde: {image_path}")
+    original_image = cv2.imread(image_path)
+    if original_image is None:
+        result['error'] = 'No se pudo leer la imagen'
+        return result
+
+    best = None
+    for angle, rotate_code in ROTATIONS:
+        logging.info(f"--- Probando con rotación de {angle} grados ---")
+        rotated_image = original_image if rotate_code is None else cv2.rotate(original_image, rotate_code)
+        full_text, char_confidences = _ocr_text_and_confidences(_preprocess(rotated_image))
+        result['passes'] += 1
+        preview = full_text[:250].replace('\n', ' ')
+        logging.info(f"Texto extraído (rotación {angle}°): \"{preview}...\"")
+
+        candidates = find_rut_candidates(full_text, char_confidences)
+        if candidates and (best is None or candidates[0]['score'] > best['score']):
+            best = {**candidates[0], 'rotation': angle}
+            logging.info(f"Mejor candidato (rotación {angle}°): '{best['rut']}' de '{best['raw']}' "
+                         f"(puntaje {best['score']:.2f}, DV válido: {best['verifier_valid']}, ancla: {best['anchor']})")
+        if best and best['verifier_valid'] and best['score'] >= ACCEPT_CONFIDENCE:
+            logging.info(f"¡ÉXITO! RUT aceptado en rotación {best['rotation']}° tras {result['passes']} pasadas.")
+            break
+
+    if best:
+        result.update(rut=best['rut'], confidence=best['score'], rotation=best['rotation'], anchor=best['anchor'],
+                      verifier_valid=best['verifier_valid'], repairs=best['repairs'])
+        if not best['verifier_valid']:
+            logging.warning(f"El RUT '{best['rut']}' no tiene un dígito verificador válido.")
+    else:
+        logging.error("No se encontró un RUT procesable en ninguna orientación.")
+
+    result['elapsed'] = time.perf_counter() - start_time
+    return result
+
+def extract_rut_from_image(image_path):
+    try:
+        return extract_rut_with_details(image_path)['rut']
+    except Exception as e:
+        logging.error(f"Error en pipeline de OCR: {e}", exc_info=True)
+        return None
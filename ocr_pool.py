@@ -0,0 +1,109 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+class OcrPoolSaturated(Exception):
+    """El pool de OCR tiene todos sus procesos ocupados y la cola llena."""
+
+def _init_ocr_process():
+    # Un hilo por proceso: el paralelismo del OCR lo dan los procesos del pool.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    import cv2
+    cv2.setNumThreads(1)
+
+def _extract_rut(image_path):
+    from ocr import extract_rut_from_image
+    return extract_rut_from_image(image_path)
+
+class OcrPool:
+    """
+    Pool de procesos dedicado al OCR de /validate_rut, separado de los hilos que atienden
+    las rutas livianas. Los procesos se crean con 'spawn' en el primer uso (nunca en el
+    master de gunicorn) y se reciclan tras max_tasks_per_child imágenes para contener el
+    crecimiento de memoria de OpenCV.
+
+    Si hay más de workers + max_queue solicitudes en curso, submit lanza OcrPoolSaturated
+    en lugar de encolar sin límite.
+    """
+    def __init__(self, workers, max_queue, max_tasks_per_child):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_tasks_per_child = max_tasks_per_child
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.executor = None
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_ocr_process,
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+            logging.info(f"Pool de OCR iniciado con {self.workers} procesos (pid {os.getpid()}).")
+        return self.executor
+
+    def _release_slot(self, future=None):
+        # Se llama al terminar el futuro, no al vencer el timeout: mientras el proceso
+        # siga trabajando en la imagen, su cupo cuenta como ocupado.
+        with self.lock:
+            self.in_flight -= 1
+
+    def _discard_executor(self, executor):
+        # Un proceso hijo murió (OOM, segfault de OpenCV): el executor queda inutilizable
+        # y se descarta para que la próxima solicitud cree uno nuevo.
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        logging.error("El pool de OCR perdió un proceso; se recreará en la próxima solicitud.")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract_rut(self, image_path, timeout=None):
+        with self.lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                raise OcrPoolSaturated()
+            self.in_flight += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(_extract_rut, image_path)
+        except BrokenProcessPool:
+            self._release_slot()
+            self._discard_executor(executor)
+            raise
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._release_slot)
+        try:
+            return future.result(timeout=timeout)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def check_capacity(self):
+        """Lanza OcrPoolSaturated si una nueva solicitud sería rechazada."""
+        with self.lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                raise OcrPoolSaturated()
+
+    def stats(self):
+        with self.lock:
+            in_flight = self.in_flight
+        capacity = self.workers + self.max_queue
+        return {
+            'workers': self.workers,
+            'in_flight': in_flight,
+            'queued': max(0, in_flight - self.workers),
+            'capacity': capacity,
+            'saturation': round(in_flight / capacity, 3) if capacity else 1.0,
+        }
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
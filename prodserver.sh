@@ -0,0 +1,18 @@
+#!/bin/bash
+
+set -e
+
+echo "Activating virtual environment..."
+source .venv/bin/activate
+
+# Load environment variables from .env file
+if [ -f .env ]; then
+    echo "Loading environment variables from .env..."
+    source .env
+fi
+
+echo "Precompressing static assets..."
+python assets.py > /dev/null
+
+echo "Starting gunicorn production server..."
+exec gunicorn -c gunicorn.conf.py main:app
@@ -0,0 +1,24 @@
+import re
+
+def normalize_rut(rut):
+    if not rut:
+        return ""
+    return re.sub(r'[^0-9kK]', '', str(rut)).upper()
+
+def compute_verifier_digit(body):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT: '0'-'9' o 'K'."""
+    total = sum(int(digit) * (2 + i % 6) for i, digit in enumerate(reversed(body)))
+    remainder = 11 - total % 11
+    if remainder == 11:
+        return '0'
+    if remainder == 10:
+        return 'K'
+    return str(remainder)
+
+def is_valid_rut(rut):
+    """Indica si un RUT (con o sin formato) tiene largo válido y dígito verificador correcto."""
+    normalized = normalize_rut(rut)
+    body, verifier = normalized[:-1], normalized[-1:]
+    if not 7 <= len(body) <= 8 or not body.isdigit():
+        return False
+    return compute_verifier_digit(body) == verifier
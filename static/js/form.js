@@ -34,6 +34,24 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentCropSide = 'front'; // 'front' or 'back'
     let frontFile, backFile;
 
+    // --- Barra de progreso de subida ---
+    const uploadProgress = document.getElementById('upload-progress');
+    const uploadProgressBar = document.getElementById('upload-progress-bar');
+
+    // --- Procesamiento de imagen en el cliente ---
+    // El OCR del servidor trabaja en escala de grises y duplica la resolución antes de leer,
+    // por lo que ~1000 px de ancho para la cédula (≈300 ppp) es suficiente. Subir la foto
+    // completa de la cámara solo agrega tiempo de subida, disco y preprocesamiento.
+    const IMAGE_PROCESSING = {
+        maxWidth: 1000,
+        maxHeight: 630,
+        quality: 0.82,
+        grayscale: false,
+    };
+    const supportsWebP = document.createElement('canvas').toDataURL('image/webp').startsWith('data:image/webp');
+    const outputType = supportsWebP ? 'image/webp' : 'image/jpeg';
+    const outputExtension = supportsWebP ? 'webp' : 'jpg';
+
     // --- LÓGICA CENTRAL DE NAVEGACIÓN Y UI ---
 
     function showStep(stepIndex) {
@@ -67,6 +85,73 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // --- LÓGICA DE RECORTE Y VALIDACIÓN DE CÉDULA (Paso 2) ---
 
+    function toGrayscale(canvas) {
+        const ctx = canvas.getContext('2d');
+        const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height);
+        const data = imageData.data;
+        for (let i = 0; i < data.length; i += 4) {
+            // Luminancia BT.601, la misma que usa cv2.COLOR_BGR2GRAY en el servidor.
+            const y = 0.299 * data[i] + 0.587 * data[i + 1] + 0.114 * data[i + 2];
+            data[i] = data[i + 1] = data[i + 2] = y;
+        }
+        ctx.putImageData(imageData, 0, 0);
+        return canvas;
+    }
+
+    function processCroppedImage(side) {
+        // maxWidth/maxHeight reducen recortes grandes sin ampliar los pequeños.
+        let canvas = cropper.getCroppedCanvas({
+            maxWidth: IMAGE_PROCESSING.maxWidth,
+            maxHeight: IMAGE_PROCESSING.maxHeight,
+            imageSmoothingEnabled: true,
+            imageSmoothingQuality: 'high',
+        });
+        if (IMAGE_PROCESSING.grayscale) canvas = toGrayscale(canvas);
+
+        return new Promise((resolve, reject) => {
+            canvas.toBlob((blob) => {
+                if (!blob) {
+                    reject(new Error('No se pudo procesar la imagen.'));
+                    return;
+                }
+                const baseName = side === 'front' ? 'id_frontal_recortada' : 'id_trasera_recortada';
+                resolve(new File([blob], `${baseName}.${outputExtension}`, { type: outputType, lastModified: Date.now() }));
+            }, outputType, IMAGE_PROCESSING.quality);
+        });
+    }
+
+    function setUploadProgress(percent, label) {
+        if (!uploadProgress) return;
+        uploadProgress.style.display = 'flex';
+        uploadProgressBar.style.width = `${percent}%`;
+        uploadProgressBar.setAttribute('aria-valuenow', percent);
+        uploadProgressBar.textContent = label;
+    }
+
+    function hideUploadProgress() {
+        if (uploadProgress) uploadProgress.style.display = 'none';
+    }
+
+    // fetch no informa el avance de la subida, por eso se usa XMLHttpRequest.
+    function postWithProgress(url, formData, onProgress) {
+        return new Promise((resolve, reject) => {
+            const xhr = new XMLHttpRequest();
+            xhr.open('POST', url);
+            xhr.responseType = 'json';
+            xhr.upload.addEventListener('progress', (event) => {
+                if (event.lengthComputable) onProgress(event.loaded / event.total);
+            });
+            xhr.upload.addEventListener('load', () => onProgress(1));
+            xhr.addEventListener('load', () => {
+                const data = xhr.response || {};
+                if (xhr.status >= 200 && xhr.status < 300) resolve(data);
+                else reject(new Error(data.error || `Error: ${xhr.statusText}`));
+            });
+            xhr.addEventListener('error', () => reject(new Error('Fallo de red')));
+            xhr.send(formData);
+        });
+    }
+
     function startCropper(event) {
         const file = event.target.files[0];
         if (!file) return;
@@ -97,20 +182,12 @@ document.addEventListener('DOMContentLoaded', function() {
 
     if (cropAndSaveBtn) {
         cropAndSaveBtn.addEventListener('click', () => {
-            const canvas = cropper.getCroppedCanvas({
-                width: 856,
-                height: 540,
-                imageSmoothingQuality: 'high',
-            });
-
-            canvas.toBlob((blob) => {
-                const fileName = currentCropSide === 'front' ? 'id_frontal_recortada.jpg' : 'id_trasera_recortada.jpg';
-                const croppedFile = new File([blob], fileName, { type: 'image/jpeg', lastModified: Date.now() });
-                
-                const previewId = `preview-${currentCropSide}`;
+            const side = currentCropSide;
+            processCroppedImage(side).then((croppedFile) => {
+                const previewId = `preview-${side}`;
                 const preview = document.getElementById(previewId);
 
-                if (currentCropSide === 'front') {
+                if (side === 'front') {
                     frontFile = croppedFile;
                 } else {
                     backFile = croppedFile;
@@ -124,7 +201,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (frontFile) validateRutBtn.disabled = false;
                 
                 cropModal.hide();
-            }, 'image/jpeg', 0.9);
+            }).catch((error) => {
+                cropModal.hide();
+                showAlert('validation-result', `❌ ${error.message} Inténtalo con otra foto.`, 'danger');
+            });
         });
     }
 
@@ -148,10 +228,14 @@ document.addEventListener('DOMContentLoaded', function() {
             formData.append('id_frontal', frontFile);
             if (backFile) formData.append('id_trasera', backFile);
 
-            fetch('/validate_rut', { method: 'POST', body: formData })
-            .then(response => response.ok ? response.json() : response.json().then(err => { throw new Error(err.error || `Error: ${response.statusText}`) }))
+            setUploadProgress(0, 'Subiendo imagen... 0%');
+            postWithProgress('/validate_rut', formData, (fraction) => {
+                const percent = Math.round(fraction * 100);
+                setUploadProgress(percent, percent < 100 ? `Subiendo imagen... ${percent}%` : 'Verificando RUT...');
+            })
             .then(data => {
                 loader.style.display = 'none';
+                hideUploadProgress();
                 if (data.success) {
                     if (data.rut_match) {
                         showAlert('validation-result', `✅ ¡Validación exitosa! El RUT de la imagen (${data.extracted_rut}) coincide.`, 'success');
@@ -167,6 +251,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .catch(error => {
                 loader.style.display = 'none';
+                hideUploadProgress();
                 showAlert('validation-result', `❌ Error de conexión o servidor: ${error.message}. Inténtalo de nuevo.`, 'danger');
                 validateRutBtn.disabled = false;
             });
@@ -174,6 +259,11 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // --- LÓGICA DE GUARDADO FINAL (Paso 3) ---
+    // Una clave por carga de la página: si se reintenta el guardado, el servidor no duplica el voto.
+    const voteIdempotencyKey = (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+
     if (saveDataBtn) {
         saveDataBtn.addEventListener('click', () => {
             const selectedAnswer = document.querySelector('input[name="final-answer"]:checked');
@@ -185,7 +275,7 @@ document.addEventListener('DOMContentLoaded', function() {
             saveDataBtn.disabled = true;
             saveDataBtn.innerHTML = '<span class="spinner-border spinner-border-sm"></span> Guardando...';
 
-            fetch('/save_data', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ final_answer: selectedAnswer.value }) })
+            fetch('/save_data', { method: 'POST', headers: { 'Content-Type': 'application/json', 'Idempotency-Key': voteIdempotencyKey }, body: JSON.stringify({ final_answer: selectedAnswer.value }) })
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
@@ -1,18 +1,182 @@
 
 import os
 import sys
+import json
+import base64
+import time
+import shutil
+import subprocess
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import pytest
-from main import app
+from botocore.exceptions import ClientError
+from flask import url_for
+from main import app, _transaction_token
+from assets import AssetManifest
 
 @pytest.fixture
-def client():
+def client(tmp_path):
+    # Los assets se sirven desde una copia temporal: las variantes .gz/.br no se escriben en el repo.
+    static_folder, assets = app.static_folder, app.extensions['assets']
+    shutil.copytree(static_folder, tmp_path / 'static', ignore=shutil.ignore_patterns('uploads', '*.gz', '*.br'))
+    app.static_folder = str(tmp_path / 'static')
+    app.extensions['assets'] = AssetManifest(app.static_folder)
     app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+    try:
+        with app.test_client() as client:
+            yield client
+    finally:
+        app.static_folder = static_folder
+        app.extensions['assets'] = assets
+        app.extensions.pop('dynamodb_client', None)
 
 def test_home_page(client):
     """Test the home page."""
     rv = client.get('/')
     assert rv.status_code == 200
+
+def test_import_does_not_load_ocr_stack():
+    """Test that importing the app does not import OpenCV/Tesseract or create AWS clients."""
+    code = (
+        "import sys, main; "
+        "assert 'cv2' not in sys.modules and 'pytesseract' not in sys.modules; "
+        "assert 'dynamodb_client' not in main.app.extensions"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_static_assets_are_fingerprinted_and_cached(client):
+    """Test that static assets get a content hash URL, gzip and immutable caching."""
+    with app.test_request_context():
+        url = url_for('static', filename='js/form.js')
+    assert url != '/static/js/form.js' and url.endswith('.js')
+    rv = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert rv.status_code == 200
+    assert 'immutable' in rv.headers['Cache-Control']
+    assert rv.headers['Content-Encoding'] == 'gzip'
+    assert 'no-store' in client.get('/').headers['Cache-Control']
+
+class FakeDynamoDB:
+    """Cliente mínimo de DynamoDB que aplica la condición de voto único por unidad y los tokens de idempotencia."""
+    def __init__(self, voted=(), tokens=None):
+        self.voted = set(voted)
+        self.tokens = dict(tokens or {})
+        self.calls = []
+
+    def transact_write_items(self, TransactItems, ClientRequestToken):
+        self.calls.append(len(TransactItems))
+        if ClientRequestToken in self.tokens:
+            if self.tokens[ClientRequestToken] != TransactItems:
+                raise ClientError({'Error': {'Code': 'IdempotentParameterMismatchException', 'Message': 'mismatch'}}, 'TransactWriteItems')
+            return
+        self.tokens[ClientRequestToken] = TransactItems
+        units = [item['Put']['Item']['unidad']['S'] for item in TransactItems]
+        reasons = [{'Code': 'ConditionalCheckFailed' if unit in self.voted else 'None'} for unit in units]
+        if any(reason['Code'] != 'None' for reason in reasons):
+            raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': 'cancelled'}, 'CancellationReasons': reasons}, 'TransactWriteItems')
+        self.voted.update(units)
+
+    def batch_get_item(self, RequestItems):
+        (table, request), = RequestItems.items()
+        assert request['ConsistentRead']
+        found = [{'unidad': key['unidad']} for key in request['Keys'] if key['unidad']['S'] in self.voted]
+        return {'Responses': {table: found}, 'UnprocessedKeys': {}}
+
+def login_as(client, units):
+    claims = {'sub': 'sub-1', 'custom:Unidad': ','.join(units), 'custom:TipoUnidad': 'Departamento'}
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    with client.session_transaction() as sess:
+        sess['id_token'] = f"header.{payload}.signature"
+
+def test_save_data_single_round_trip(client):
+    """Test that a vote is committed with one transaction and no pre-read."""
+    fake = app.extensions['dynamodb_client'] = FakeDynamoDB()
+    login_as(client, ['101', '102'])
+    rv = client.post('/save_data', json={'final_answer': 'si'}, headers={'Idempotency-Key': 'test-key-0001'})
+    assert rv.json['success'] and rv.json['already_voted_units'] == []
+    assert fake.calls == [2]
+
+def test_save_data_reports_already_voted_units_and_chunks(client):
+    """Test that cancellation reasons identify voted units and large unit lists are chunked."""
+    units = [str(n) for n in range(150)]
+    fake = app.extensions['dynamodb_client'] = FakeDynamoDB(voted={'5'})
+    login_as(client, units)
+    rv = client.post('/save_data', json={'final_answer': 'no'})
+    assert rv.json['already_voted_units'] == ['Departamento 5']
+    assert fake.calls == [100, 99, 50]
+    assert fake.voted == set(units)
+
+def test_save_data_retry_with_changed_payload_confirms_before_reporting(client):
+    """Test that an idempotency mismatch only reports units that a consistent read finds voted."""
+    fake = app.extensions['dynamodb_client'] = FakeDynamoDB()
+    login_as(client, ['101'])
+    headers = {'Idempotency-Key': 'test-key-0002'}
+    assert client.post('/save_data', json={'final_answer': 'si'}, headers=headers).json['already_voted_units'] == []
+
+    # El reintento lleva otro timestamp_votacion: DynamoDB responde IdempotentParameterMismatch.
+    login_as(client, ['101'])
+    rv = client.post('/save_data', json={'final_answer': 'si'}, headers=headers)
+    assert rv.json['already_voted_units'] == ['Departamento 101']
+    assert fake.calls == [1, 1]
+
+    # Token ya usado con otros datos pero sin voto en la tabla: se reenvía con un token nuevo.
+    fake = app.extensions['dynamodb_client'] = FakeDynamoDB()
+    fake.tokens[_transaction_token('sub-1', 'test-key-0003', 0, 0)] = []
+    login_as(client, ['102'])
+    rv = client.post('/save_data', json={'final_answer': 'no'}, headers={'Idempotency-Key': 'test-key-0003'})
+    assert rv.json['message'] == "¡Tu voto ha sido guardado con éxito!"
+    assert fake.voted == {'102'} and fake.calls == [1, 1]
+
+def test_readiness_reports_ocr_pool_saturation(tmp_path, monkeypatch):
+    """Test that, with the gunicorn config, the OCR pool saturates while threads remain for cheap routes."""
+    import io
+    import runpy
+    import threading
+    import ocr_pool
+    from main import create_app
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    monkeypatch.setattr(os, 'environ', {k: v for k, v in os.environ.items() if not k.startswith(('OCR_', 'WEB_'))})
+    gunicorn_config = runpy.run_path(os.path.join(root, 'gunicorn.conf.py'))
+    prod_app = create_app({'TESTING': True, 'UPLOAD_FOLDER': str(tmp_path), 'ASSETS_PRECOMPRESS': False})
+    assert prod_app.extensions['assets'].fingerprinted is not None
+    pool = prod_app.extensions['ocr_pool']
+    assert pool.workers + pool.max_queue < gunicorn_config['threads']
+
+    release = threading.Event()
+    def blocked_ocr(image_path):
+        release.wait(10)
+        return None
+    # Hilos en lugar de procesos: el OCR simulado queda bloqueado hasta liberar el evento.
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(ocr_pool, '_extract_rut', blocked_ocr)
+    monkeypatch.setattr(pool, '_get_executor', lambda executor=ThreadPoolExecutor(pool.workers + pool.max_queue): executor)
+
+    client = prod_app.test_client()
+    assert client.get('/healthz').status_code == 200
+    assert client.get('/readyz').status_code == 200
+    callers = [threading.Thread(target=pool.extract_rut, args=('cedula.jpg',)) for _ in range(pool.workers + pool.max_queue)]
+    for caller in callers:
+        caller.start()
+    try:
+        deadline = time.time() + 5
+        while pool.stats()['in_flight'] < pool.stats()['capacity'] and time.time() < deadline:
+            time.sleep(0.01)
+        rv = client.get('/readyz')
+        assert rv.status_code == 503
+        assert rv.get_json()['ocr_pool']['saturation'] == 1.0
+
+        claims = {'sub': 'sub-1', 'custom:Rut': '12.345.678-5'}
+        payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+        with client.session_transaction() as sess:
+            sess['id_token'] = f"header.{payload}.signature"
+        rv = client.post('/validate_rut', data={'id_frontal': (io.BytesIO(b'imagen'), 'frontal.jpg')},
+                         content_type='multipart/form-data')
+        assert rv.status_code == 503
+        assert os.listdir(tmp_path) == []
+    finally:
+        release.set()
+        for caller in callers:
+            caller.join()
+    assert client.get('/readyz').status_code == 200
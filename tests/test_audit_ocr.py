@@ -0,0 +1,130 @@
+import os
+import sys
+import csv
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import audit_ocr
+import ocr
+
+class FakePaginator:
+    def __init__(self, items):
+        self.items = items
+
+    def paginate(self, **kwargs):
+        yield {'Items': self.items}
+
+class FakeDynamoDB:
+    def __init__(self, items):
+        self.items = items
+
+    def get_paginator(self, operation):
+        return FakePaginator(self.items)
+
+def participation(unidad, url, rut='12.345.678-5'):
+    return {
+        'cognito_sub': {'S': 'sub-1'}, 'unidad': {'S': unidad}, 'rut': {'S': rut},
+        'rut_match_success': {'BOOL': False}, 'rut_detectado_imagen': {'S': 'No detectado'},
+        'url_img_frontal': {'S': url},
+    }
+
+def test_load_checkpoint_and_build_report_row(tmp_path):
+    """Test that checkpoint lines are keyed by URL and report rows compare the normalized RUT."""
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    checkpoint.write_text(json.dumps({'url': '/static/uploads/a.jpg', 'rut': '123456785', 'confidence': 0.91234}) + "\n\n")
+    results = audit_ocr.load_checkpoint(str(checkpoint))
+    assert list(results) == ['/static/uploads/a.jpg']
+    assert audit_ocr.load_checkpoint(str(tmp_path / 'missing.jsonl')) == {}
+
+    row = {'rut': '12.345.678-5', 'url_img_frontal': '/static/uploads/a.jpg'}
+    report = audit_ocr.build_report_row(row, results['/static/uploads/a.jpg'])
+    assert report['coincide_reextraido'] is True and report['confianza'] == 0.912
+    report = audit_ocr.build_report_row(row, {'rut': None, 'error': 'Sin imagen frontal'})
+    assert report['rut_reextraido'] == 'No detectado' and report['coincide_reextraido'] is False
+
+def test_shared_images_are_processed_once(tmp_path, monkeypatch):
+    """Test that an image shared by several units is OCR'd once and checkpointed results are reused."""
+    uploads = tmp_path / 'static' / 'uploads'
+    uploads.mkdir(parents=True)
+    for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+        (uploads / name).write_bytes(b'imagen')
+    items = [
+        participation('101', '/static/uploads/a.jpg'),
+        participation('102', '/static/uploads/a.jpg'),
+        participation('103', '/static/uploads/b.jpg'),
+        participation('104', '/static/uploads/c.jpg'),
+        participation('105', 'N/A'),
+    ]
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    checkpoint.write_text(json.dumps({'url': '/static/uploads/c.jpg', 'rut': '111111111'}) + "\n")
+
+    processed = []
+    def fake_extract(image_path):
+        processed.append(os.path.basename(image_path))
+        return {'rut': '123456785', 'confidence': 0.9, 'rotation': 0, 'anchor': True, 'passes': 1, 'elapsed': 0.01}
+    monkeypatch.setattr(ocr, 'extract_rut_with_details', fake_extract)
+    monkeypatch.setattr(audit_ocr.boto3, 'client', lambda *args, **kwargs: FakeDynamoDB(items))
+    # Hilos en lugar de procesos: el OCR simulado no necesita el pool real.
+    monkeypatch.setattr(audit_ocr, 'ProcessPoolExecutor', lambda max_workers, initializer: ThreadPoolExecutor(max_workers))
+
+    output = tmp_path / 'reporte'
+    audit_ocr.run_audit(workers=2, output=str(output), uploads_root=str(tmp_path), checkpoint_path=str(checkpoint))
+
+    assert sorted(processed) == ['a.jpg', 'b.jpg']
+    with open(f"{output}.csv", encoding='utf-8') as f:
+        rows = {row['unidad']: row for row in csv.DictReader(f)}
+    assert rows['101']['rut_reextraido'] == rows['102']['rut_reextraido'] == '123456785'
+    assert rows['104']['rut_reextraido'] == '111111111'
+    assert rows['105']['error'] == 'Sin imagen frontal'
+    assert len(audit_ocr.load_checkpoint(str(checkpoint))) == 3
+
+class CrashingPool:
+    """Pool que se comporta como ProcessPoolExecutor cuando la imagen 'crash' mata al proceso."""
+    def __init__(self, max_workers, initializer):
+        self.broken = False
+
+    def submit(self, fn, image_url, image_path):
+        if self.broken:
+            raise BrokenProcessPool('Un proceso del pool terminó abruptamente')
+        future = Future()
+        if 'crash' in image_path:
+            self.broken = True
+            future.set_exception(BrokenProcessPool('Un proceso del pool terminó abruptamente'))
+        else:
+            future.set_result(fn(image_url, image_path))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+def test_dead_ocr_child_only_fails_its_image(tmp_path, monkeypatch):
+    """Test that an image that kills the OCR process is isolated, checkpointed and skipped on resume."""
+    uploads = tmp_path / 'static' / 'uploads'
+    uploads.mkdir(parents=True)
+    for name in ('a.jpg', 'crash.jpg', 'b.jpg'):
+        (uploads / name).write_bytes(b'imagen')
+    items = [participation(str(n), f'/static/uploads/{name}') for n, name in enumerate(('a.jpg', 'crash.jpg', 'b.jpg'))]
+
+    processed = []
+    def fake_extract(image_path):
+        processed.append(os.path.basename(image_path))
+        return {'rut': '123456785', 'confidence': 0.9, 'rotation': 0, 'anchor': True, 'passes': 1, 'elapsed': 0.01}
+    monkeypatch.setattr(ocr, 'extract_rut_with_details', fake_extract)
+    monkeypatch.setattr(audit_ocr.boto3, 'client', lambda *args, **kwargs: FakeDynamoDB(items))
+    monkeypatch.setattr(audit_ocr, 'ProcessPoolExecutor', CrashingPool)
+
+    output = tmp_path / 'reporte'
+    checkpoint = tmp_path / 'checkpoint.jsonl'
+    audit_ocr.run_audit(workers=2, output=str(output), uploads_root=str(tmp_path), checkpoint_path=str(checkpoint))
+
+    assert sorted(processed) == ['a.jpg', 'b.jpg']
+    with open(f"{output}.csv", encoding='utf-8') as f:
+        rows = {row['url_img_frontal']: row for row in csv.DictReader(f)}
+    assert rows['/static/uploads/crash.jpg']['error'] == audit_ocr.CRASH_ERROR
+    assert rows['/static/uploads/b.jpg']['rut_reextraido'] == '123456785'
+
+    processed.clear()
+    audit_ocr.run_audit(workers=2, output=str(output), uploads_root=str(tmp_path), checkpoint_path=str(checkpoint))
+    assert processed == []
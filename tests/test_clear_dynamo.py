@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import clear_dynamo
+
+class FakeDynamoDB:
+    """Cliente mínimo de DynamoDB: scan por segmento en páginas fijas y batch_write_item configurable."""
+    def __init__(self, pages_per_segment=1, page_size=2, unprocessed_rounds=0):
+        self.pages_per_segment = pages_per_segment
+        self.page_size = page_size
+        self.unprocessed_rounds = unprocessed_rounds
+        self.scans = []
+        self.writes = []
+
+    def scan(self, **kwargs):
+        self.scans.append(kwargs)
+        page = kwargs.get('ExclusiveStartKey', {}).get('page', 0)
+        response = {'Count': self.page_size}
+        if kwargs.get('Select') != 'COUNT':
+            response['Items'] = [{'pk': {'S': f"{kwargs['Segment']}-{page}-{i}"}} for i in range(self.page_size)]
+        if page + 1 < self.pages_per_segment:
+            response['LastEvaluatedKey'] = {'page': page + 1}
+        return response
+
+    def batch_write_item(self, RequestItems):
+        self.writes.append(RequestItems)
+        (table, requests), = RequestItems.items()
+        if self.unprocessed_rounds:
+            self.unprocessed_rounds -= 1
+            return {'UnprocessedItems': {table: requests[:1]}}
+        return {'UnprocessedItems': {}}
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeDynamoDB()
+    monkeypatch.setattr(clear_dynamo, 'dynamodb_client', client)
+    monkeypatch.setattr(clear_dynamo, 'BASE_BACKOFF_SECONDS', 0)
+    return client
+
+def test_delete_batch_retries_unprocessed_items(fake):
+    """Test that UnprocessedItems are resent until empty and give up after MAX_RETRIES."""
+    keys = [{'pk': {'S': str(i)}} for i in range(3)]
+    fake.unprocessed_rounds = 2
+    assert clear_dynamo._delete_batch(keys) == 3
+    assert [len(write[clear_dynamo.table_name]) for write in fake.writes] == [3, 1, 1]
+
+    fake.writes.clear()
+    fake.unprocessed_rounds = clear_dynamo.MAX_RETRIES
+    with pytest.raises(RuntimeError):
+        clear_dynamo._delete_batch(keys)
+    assert len(fake.writes) == clear_dynamo.MAX_RETRIES
+
+def test_checkpoint_for_another_table_or_segment_count_is_ignored(tmp_path):
+    """Test that a checkpoint is only resumed for the same table and number of segments."""
+    path = str(tmp_path / 'checkpoint.json')
+    segments = {str(s): {'last_key': None, 'deleted': 5, 'done': True} for s in range(4)}
+    for table, total in ((clear_dynamo.table_name, 4), ('otra_tabla', 4), (clear_dynamo.table_name, 8)):
+        with open(path, 'w') as f:
+            json.dump({'table_name': table, 'total_segments': total, 'segments': segments}, f)
+        progress = clear_dynamo.PurgeProgress(4, path=path)
+        assert progress.resumed == (table == clear_dynamo.table_name and total == 4)
+        assert progress.total_deleted == (20 if progress.resumed else 0)
+
+def test_resume_starts_at_saved_key_and_skips_done_segments(fake, tmp_path):
+    """Test that a resumed purge skips finished segments and continues from the saved key."""
+    fake.pages_per_segment = 3
+    path = str(tmp_path / 'checkpoint.json')
+    with open(path, 'w') as f:
+        json.dump({'table_name': clear_dynamo.table_name, 'total_segments': 2, 'segments': {
+            '0': {'last_key': None, 'deleted': 6, 'done': True},
+            '1': {'last_key': {'page': 2}, 'deleted': 4, 'done': False},
+        }}, f)
+    progress = clear_dynamo.PurgeProgress(2, path=path)
+    with ThreadPoolExecutor(max_workers=2) as delete_pool:
+        for segment in range(2):
+            clear_dynamo._purge_segment(segment, ['pk'], progress, delete_pool)
+
+    assert [(scan['Segment'], scan.get('ExclusiveStartKey')) for scan in fake.scans] == [(1, {'page': 2})]
+    assert progress.total_deleted == 12
+    assert progress.segment(1)['done']
+
+def test_count_items_stops_at_limit(fake):
+    """Test that the COUNT scan stops paginating once the threshold is reached."""
+    fake.pages_per_segment = 10
+    fake.page_size = 100
+    assert clear_dynamo.count_items_up_to(1, 250) == 300
+    assert len(fake.scans) == 3
+    assert all(scan['Select'] == 'COUNT' for scan in fake.scans)
+
+def test_create_table_args_for_on_demand_table():
+    """Test that an on-demand table is recreated without provisioned throughput on the table or its GSIs."""
+    zero = {'ReadCapacityUnits': 0, 'WriteCapacityUnits': 0, 'NumberOfDecreasesToday': 0}
+    table = {
+        'TableName': 'user_participations',
+        'AttributeDefinitions': [{'AttributeName': 'cognito_sub', 'AttributeType': 'S'}],
+        'KeySchema': [{'AttributeName': 'cognito_sub', 'KeyType': 'HASH'}],
+        'BillingModeSummary': {'BillingMode': 'PAY_PER_REQUEST'},
+        'ProvisionedThroughput': zero,
+        'GlobalSecondaryIndexes': [{
+            'IndexName': 'por_unidad', 'KeySchema': [{'AttributeName': 'unidad', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}, 'ProvisionedThroughput': zero,
+        }],
+    }
+    args = clear_dynamo._build_create_table_args(table)
+    assert args['BillingMode'] == 'PAY_PER_REQUEST'
+    assert 'ProvisionedThroughput' not in args
+    assert all('ProvisionedThroughput' not in index for index in args['GlobalSecondaryIndexes'])
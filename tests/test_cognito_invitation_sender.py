@@ -0,0 +1,98 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+import cognito_invitation_sender as sender
+
+class UnreachableSES(sender.LocalSESStub):
+    def send_bulk_templated_email(self, **kwargs):
+        raise EndpointConnectionError(endpoint_url='https://email.us-east-1.amazonaws.com')
+
+class QuotaSES(sender.LocalSESStub):
+    """SES con cuota diaria limitada que responde como SES al agotarla."""
+    def __init__(self, outbox_path, max_24h, sent_24h=0, reported_max_24h=None):
+        super().__init__(outbox_path, max_send_rate=1000)
+        self.max_24h = max_24h
+        self.reported_max_24h = max_24h if reported_max_24h is None else reported_max_24h
+        self.sent_24h = sent_24h
+        self.calls = 0
+        self.create_template({'TemplateName': sender.TEMPLATE_NAME, 'SubjectPart': '', 'HtmlPart': '', 'TextPart': ''})
+
+    def get_send_quota(self):
+        return {'Max24HourSend': self.reported_max_24h, 'MaxSendRate': self.max_send_rate, 'SentLast24Hours': self.sent_24h}
+
+    def send_bulk_templated_email(self, **kwargs):
+        self.calls += 1
+        if self.max_24h >= 0 and self.sent_24h + len(kwargs['Destinations']) > self.max_24h:
+            raise ClientError({'Error': {'Code': 'Throttling', 'Message': 'Daily message quota exceeded.'}}, 'SendBulkTemplatedEmail')
+        self.sent_24h += len(kwargs['Destinations'])
+        return super().send_bulk_templated_email(**kwargs)
+
+def recipients_for(count):
+    return ((f"user{i}@example.com", {'name': f"User {i}"}) for i in range(count))
+
+def test_daily_quota_limits_what_is_queued(tmp_path, monkeypatch):
+    """Test that no more emails than the remaining 24 h quota are queued and the rest stay resumable."""
+    monkeypatch.chdir(tmp_path)
+    journal = sender.Journal('.invitaciones_test.journal')
+    ses = QuotaSES(str(tmp_path / 'outbox.jsonl'), max_24h=100, sent_24h=60)
+    try:
+        result = sender.send_templated_batches(ses, recipients_for(70), 'votacion@example.com', journal)
+    finally:
+        journal.close()
+    assert result == {'sent': 40, 'failed': 0, 'journal': 0, 'duplicates': 0, 'over_quota': 30}
+    assert len(journal.entries) == 40
+
+def test_daily_quota_error_is_not_retried(tmp_path, monkeypatch):
+    """Test that a 'Daily message quota exceeded' throttle stops sending instead of backing off."""
+    monkeypatch.chdir(tmp_path)
+    journal = sender.Journal('.invitaciones_test.journal')
+    # La cuota informada es ilimitada (-1), pero SES ya la agotó.
+    ses = QuotaSES(str(tmp_path / 'outbox.jsonl'), max_24h=0, reported_max_24h=-1)
+    try:
+        result = sender.send_templated_batches(ses, recipients_for(120), 'votacion@example.com', journal)
+    finally:
+        journal.close()
+    assert result == {'sent': 0, 'failed': 0, 'journal': 0, 'duplicates': 0, 'over_quota': 120}
+    assert 1 <= ses.calls <= sender.MAX_SEND_WORKERS
+
+def test_network_errors_count_batches_as_failed(tmp_path, monkeypatch):
+    """Test that a non-ClientError from SES marks the batch as failed instead of being lost."""
+    monkeypatch.chdir(tmp_path)
+    journal = sender.Journal('.invitaciones_test.journal')
+    recipients = ((f"user{i}@example.com", {'name': f"User {i}"}) for i in range(30))
+    try:
+        result = sender.send_templated_batches(UnreachableSES(), recipients, 'votacion@example.com', journal)
+    finally:
+        journal.close()
+    assert result == {'sent': 0, 'failed': 30, 'journal': 0, 'duplicates': 0, 'over_quota': 0}
+    assert not journal.entries
+
+def test_pending_recipients_merge_units_of_users_sharing_an_email():
+    """Test the join against the voted index and that users sharing an email get one merged reminder."""
+    def user(sub, email, units):
+        return email, {'name': sub}, {'sub': sub, 'email': email, 'custom:Unidad': units, 'custom:TipoUnidad': 'Departamento'}
+    recipients = [
+        user('s1', 'familia@example.com', '101,102'),
+        user('s2', 'otro@example.com', '201'),
+        user('s3', 'familia@example.com', '301'),
+    ]
+    voted = {('s1', '101'), ('s2', '201')}
+    stats = {'pending': 0, 'completed': 0}
+    pending = list(sender.iter_pending_recipients(iter(recipients), voted, stats))
+    assert pending == [('familia@example.com', {'name': 's1', 'unidades': 'Departamento 102, Departamento 301'})]
+    assert stats == {'pending': 2, 'completed': 1}
+
+def test_duplicate_emails_are_not_counted_as_journal_hits(tmp_path, monkeypatch):
+    """Test that addresses repeated in one run are reported apart from previously sent ones."""
+    monkeypatch.chdir(tmp_path)
+    journal = sender.Journal('.invitaciones_test.journal')
+    journal.record('user0@example.com')
+    recipients = list(recipients_for(3)) + [('user2@example.com', {'name': 'Otro'})]
+    ses = QuotaSES(str(tmp_path / 'outbox.jsonl'), max_24h=-1)
+    try:
+        result = sender.send_templated_batches(ses, recipients, 'votacion@example.com', journal)
+    finally:
+        journal.close()
+    assert result == {'sent': 2, 'failed': 0, 'journal': 1, 'duplicates': 1, 'over_quota': 0}
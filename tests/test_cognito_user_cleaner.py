@@ -0,0 +1,88 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import pytest
+from botocore.exceptions import ClientError
+import cognito_user_cleaner as cleaner
+
+POOL_ID = 'us-east-1_test'
+
+class FakeCognito:
+    """
+    User Pool en memoria. list_users pagina por posición sobre la lista viva, por lo que
+    eliminar mientras se pagina salta usuarios, igual que en Cognito.
+    """
+    def __init__(self, users, throttled=None, failing=()):
+        self.users = list(users)
+        self.throttled = dict(throttled or {})
+        self.failing = set(failing)
+        self.delete_calls = {}
+        self.passes = 0
+        self.lock = threading.Lock()
+
+    def describe_user_pool(self, UserPoolId):
+        return {}
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, UserPoolId, AttributesToGet):
+        self.passes += 1
+        offset = 0
+        while offset < len(self.users):
+            with self.lock:
+                page = self.users[offset:offset + 2]
+            offset += 2
+            yield {'Users': [{'Username': username} for username in page]}
+
+    def admin_delete_user(self, UserPoolId, Username):
+        with self.lock:
+            self.delete_calls[Username] = self.delete_calls.get(Username, 0) + 1
+            throttled = self.throttled.get(Username)
+            if throttled:
+                self.throttled[Username] -= 1
+        if throttled:
+            raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}}, 'AdminDeleteUser')
+        if Username in self.failing:
+            raise ClientError({'Error': {'Code': 'NotAuthorizedException', 'Message': 'denied'}}, 'AdminDeleteUser')
+        with self.lock:
+            self.users.remove(Username)
+
+@pytest.fixture
+def run_cleaner(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('COGNITO_USER_POOL_ID', POOL_ID)
+    monkeypatch.setattr(cleaner, 'BASE_BACKOFF_SECONDS', 0)
+    def run(fake):
+        monkeypatch.setattr(cleaner.boto3, 'client', lambda *args, **kwargs: fake)
+        cleaner.delete_all_cognito_users(rate=1000, workers=4)
+    return run
+
+def journal_path():
+    return f".cognito_user_cleaner_{POOL_ID}.journal"
+
+def test_clean_run_repeats_passes_retries_throttling_and_removes_journal(run_cleaner):
+    """Test that passes repeat until none finds pending users, throttling is retried and journaled users are skipped."""
+    with open(journal_path(), 'w') as f:
+        f.write("u0\n")
+    fake = FakeCognito([f"u{i}" for i in range(9)], throttled={'u4': 2})
+    run_cleaner(fake)
+    assert fake.users == ['u0']
+    assert 'u0' not in fake.delete_calls
+    assert fake.delete_calls['u4'] == 3
+    assert fake.passes >= 2
+    assert not os.path.exists(journal_path())
+
+def test_failures_stop_further_passes_and_keep_the_journal(run_cleaner):
+    """Test that a non-throttling error counts as failed, ends the run after the pass and keeps the journal."""
+    # u0 está en la primera página, que siempre se lee completa en la primera pasada.
+    fake = FakeCognito([f"u{i}" for i in range(9)], failing={'u0'})
+    run_cleaner(fake)
+    assert fake.passes == 1
+    assert fake.delete_calls['u0'] == 1
+    with open(journal_path()) as f:
+        journaled = {line.strip() for line in f if line.strip()}
+    assert 'u0' not in journaled
+    assert journaled == {f"u{i}" for i in range(9)} - set(fake.users)
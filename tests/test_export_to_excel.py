@@ -0,0 +1,40 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from decimal import Decimal
+from export_to_excel import MISSING, deserialize_dynamodb_item, deserialize_pages_columnar
+
+def test_deserialize_nested_types():
+    """Test that nested and set types are decoded instead of stringified."""
+    item = {
+        'mapa': {'M': {'a': {'N': '1.5'}, 'b': {'L': [{'S': 'x'}, {'NULL': True}]}}},
+        'etiquetas': {'SS': ['a', 'b']},
+        'numeros': {'NS': ['1', '2.5']},
+        'cantidad_intentos_rut': {'N': '3'},
+        'tiempo_deteccion_rut': {'N': '2.25'},
+        'otro_numero': {'N': '10'},
+    }
+    result = deserialize_dynamodb_item(item)
+    assert result['mapa'] == {'a': Decimal('1.5'), 'b': ['x', None]}
+    assert result['etiquetas'] == {'a', 'b'}
+    assert result['numeros'] == {Decimal('1'), Decimal('2.5')}
+    assert result['cantidad_intentos_rut'] == 3 and isinstance(result['cantidad_intentos_rut'], int)
+    assert result['tiempo_deteccion_rut'] == 2.25 and isinstance(result['tiempo_deteccion_rut'], float)
+    assert result['otro_numero'] == Decimal('10')
+
+def test_deserialize_pages_columnar():
+    """Test that pages become aligned columns with MISSING for absent attributes."""
+    pages = [
+        {'Items': [{'unidad': {'S': '101'}, 'rut_match_success': {'BOOL': True}}]},
+        {'Items': [
+            {'unidad': {'S': '102'}, 'cantidad_intentos_rut': {'N': '2'}},
+            {'unidad': {'N': '103'}, 'rut_match_success': {'BOOL': False}},
+        ]},
+    ]
+    row_count, columns = deserialize_pages_columnar(pages)
+    assert row_count == 3
+    assert columns['unidad'] == ['101', '102', Decimal('103')]
+    assert columns['rut_match_success'] == [True, MISSING, False]
+    assert columns['cantidad_intentos_rut'] == [MISSING, 2, MISSING]
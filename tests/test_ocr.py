@@ -0,0 +1,45 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import cv2
+import ocr
+
+def fake_image_to_data(lines_per_pass):
+    """Simula pytesseract.image_to_data: una lista de líneas [(palabra, confianza)] por pasada."""
+    passes = iter(lines_per_pass)
+    def image_to_data(*args, **kwargs):
+        data = {'text': [], 'conf': [], 'block_num': [], 'par_num': [], 'line_num': []}
+        for line_num, line in enumerate(next(passes)):
+            for word, confidence in line:
+                data['text'].append(word)
+                data['conf'].append(confidence)
+                data['block_num'].append(1)
+                data['par_num'].append(1)
+                data['line_num'].append(line_num)
+        return data
+    return image_to_data
+
+def test_candidates_repair_confusions_and_check_verifier_digit():
+    """Test that OCR confusions are repaired and a valid verifier digit outranks an invalid one."""
+    candidates = ocr.find_rut_candidates("CEDULA 11.111.111-2\nRUN l2.345.67B-5")
+    assert [c['rut'] for c in candidates] == ['123456785', '111111112']
+    best = candidates[0]
+    assert best['verifier_valid'] and best['anchor'] and best['repairs'] == 2
+    assert not candidates[1]['verifier_valid']
+
+def test_pipeline_stops_at_first_confident_candidate(tmp_path, monkeypatch):
+    """Test that the pipeline stops at the rotation whose candidate clears the threshold."""
+    image_path = str(tmp_path / 'cedula.png')
+    cv2.imwrite(image_path, np.full((40, 60, 3), 255, dtype=np.uint8))
+    monkeypatch.setattr(ocr.pytesseract, 'image_to_data', fake_image_to_data([
+        [[('RUN', 90), ('12.345.678-5', 20)]],
+        [[('RUN', 95), ('12.345.678-5', 92)]],
+        [[('RUN', 99), ('12.345.678-5', 99)]],
+    ]))
+    result = ocr.extract_rut_with_details(image_path)
+    assert result['rut'] == '123456785'
+    assert result['rotation'] == 90 and result['passes'] == 2
+    assert result['verifier_valid'] and result['anchor']
+    assert result['confidence'] >= ocr.ACCEPT_CONFIDENCE
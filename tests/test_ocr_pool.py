@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+import ocr_pool
+from ocr_pool import OcrPool
+
+def fake_extract_rut(image_path):
+    """Sustituye al OCR en los procesos del pool: 'crash' mata al proceso, 'lenta' demora."""
+    if image_path == 'crash':
+        os._exit(1)
+    if image_path == 'lenta':
+        time.sleep(1)
+    return '123456785'
+
+def wait_for_idle(pool, deadline=10):
+    end = time.time() + deadline
+    while pool.stats()['in_flight'] and time.time() < end:
+        time.sleep(0.05)
+    return pool.stats()['in_flight']
+
+def test_pool_recovers_after_a_child_dies(monkeypatch):
+    """Test that a dead OCR child breaks only the current request and the pool is rebuilt."""
+    monkeypatch.setattr(ocr_pool, '_extract_rut', fake_extract_rut)
+    monkeypatch.setattr(ocr_pool, '_init_ocr_process', None)
+    pool = OcrPool(workers=1, max_queue=1, max_tasks_per_child=10)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            pool.extract_rut('crash', timeout=30)
+        assert pool.extract_rut('cedula.jpg', timeout=30) == '123456785'
+        assert wait_for_idle(pool) == 0
+    finally:
+        pool.shutdown()
+
+def test_timed_out_request_keeps_its_slot_until_done(monkeypatch):
+    """Test that a timed-out OCR call still counts as in flight while the child is working."""
+    monkeypatch.setattr(ocr_pool, '_extract_rut', fake_extract_rut)
+    monkeypatch.setattr(ocr_pool, '_init_ocr_process', None)
+    pool = OcrPool(workers=1, max_queue=0, max_tasks_per_child=10)
+    try:
+        pool.extract_rut('cedula.jpg', timeout=30)  # Arranca el proceso hijo.
+        with pytest.raises(TimeoutError):
+            pool.extract_rut('lenta', timeout=0.1)
+        assert pool.stats()['in_flight'] == 1
+        assert wait_for_idle(pool) == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,21 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rut import compute_verifier_digit, is_valid_rut
+
+def test_verifier_digit():
+    """Test the módulo 11 verifier digit, including the 0 and K cases."""
+    assert compute_verifier_digit('12345678') == '5'
+    assert compute_verifier_digit('11111111') == '1'
+    assert compute_verifier_digit('6000001') == '8'
+    assert compute_verifier_digit('10000013') == 'K'
+    assert compute_verifier_digit('10000004') == '0'
+
+def test_is_valid_rut():
+    """Test RUT validation with and without formatting."""
+    assert is_valid_rut('12.345.678-5')
+    assert is_valid_rut('10000013-k')
+    assert not is_valid_rut('12.345.678-6')
+    assert not is_valid_rut('123-5')
+    assert not is_valid_rut('')
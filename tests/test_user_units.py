@@ -0,0 +1,15 @@
+
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from user_units import parse_user_units
+
+def test_parse_user_units_shared_type():
+    """Test that a single unit type applies to every unit."""
+    units = parse_user_units({'sub': 's1', 'custom:Unidad': '101, 102', 'custom:TipoUnidad': 'Departamento'})
+    assert units == [{'tipo_unidad': 'Departamento', 'unidad': '101'}, {'tipo_unidad': 'Departamento', 'unidad': '102'}]
+
+def test_parse_user_units_mismatch():
+    """Test that mismatched unit and type counts yield no units."""
+    assert parse_user_units({'sub': 's1', 'custom:Unidad': '101,102,103', 'custom:TipoUnidad': 'Depto,Bodega'}) == []
@@ -0,0 +1,20 @@
+import logging
+
+def parse_user_units(user_attributes):
+    """
+    Obtiene las unidades de un usuario a partir de sus atributos de Cognito
+    (custom:Unidad y custom:TipoUnidad, separados por comas).
+
+    Devuelve una lista de {'tipo_unidad', 'unidad'}. Si hay un solo tipo para
+    varias unidades se aplica a todas; si las cantidades no coinciden devuelve [].
+    """
+    cognito_units_str = user_attributes.get('custom:Unidad', '')
+    cognito_types_str = user_attributes.get('custom:TipoUnidad', '')
+    unit_numbers = [u.strip() for u in cognito_units_str.split(',') if u.strip()]
+    unit_types = [t.strip() for t in cognito_types_str.split(',') if t.strip()]
+    if len(unit_numbers) > 1 and len(unit_types) == 1:
+        unit_types = unit_types * len(unit_numbers)
+    if len(unit_numbers) != len(unit_types):
+        logging.error(f"Discordancia en datos de Cognito para {user_attributes.get('sub')}")
+        return []
+    return [{'tipo_unidad': type, 'unidad': num} for type, num in zip(unit_types, unit_numbers)]